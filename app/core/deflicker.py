@@ -1,55 +1,331 @@
 # app/core/deflicker.py
+import functools
+import os
+
 import cv2
 import numpy as np
+from app.utils import config
+from app.utils.file_utils import file_identity
+from .frame_source import PathFrameSource
+from .frame_store import FrameStore
 from .image_processor import ImageProcessor
+from .parallel_decoder import ParallelDecoder
 from PySide6.QtCore import QObject, Signal
-from scipy import signal
-import threading
-import time
+from . import exposure, smoothing
+from .exposure import linear_to_lightness
+
+
+def measure_brightness(image):
+    """Calcula el brillo promedio de una imagen (canal L de LAB)"""
+    if image is None:
+        return None
+    if image.dtype.kind == 'f':
+        # Luminancia lineal del sensor (análisis "bayer"): misma escala que el canal L
+        return float(np.mean(linear_to_lightness(image)))
+    if len(image.shape) == 3:
+        # Convertir a espacio de color LAB y usar el canal L (luminancia)
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        l_channel = lab[:, :, 0]
+        return float(np.mean(l_channel))
+    else:
+        return float(np.mean(image))
+
+
+@functools.lru_cache(maxsize=1024)
+def correction_lut(correction_factor, mode="lut"):
+    """Tabla de 256 entradas (uint8) que aplica un factor de corrección de luminancia.
+
+    - "lut": tabla única para los tres canales BGR, obtenida llevando una rampa de grises
+      a LAB, escalando L y volviendo a BGR. Es exacta en los grises y evita toda
+      conversión de color por fotograma.
+    - "lab": tabla de tres canales para una imagen LAB que escala solo L y deja a y b
+      intactos (mismo resultado que la corrección en LAB sin LUT).
+    - "gray": escala directa para imágenes de un canal.
+    """
+    ramp = np.arange(256, dtype=np.float32)
+    scaled = np.clip(ramp * correction_factor, 0, 255).astype(np.uint8)
+    if mode == "gray":
+        return scaled
+    if mode == "lab":
+        identity = ramp.astype(np.uint8)
+        return np.dstack((scaled, identity, identity)).reshape(1, 256, 3)
+
+    gray = np.repeat(ramp.astype(np.uint8).reshape(1, 256, 1), 3, axis=2)
+    lab = cv2.cvtColor(gray, cv2.COLOR_BGR2LAB)
+    lab[:, :, 0] = np.clip(lab[:, :, 0].astype(np.float32) * correction_factor, 0, 255).astype(np.uint8)
+    return np.ascontiguousarray(cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)[0, :, 0])
+
+
+@functools.lru_cache(maxsize=64)
+def correction_lut_16(correction_factor):
+    """Tabla de 65536 entradas (uint16) equivalente a `correction_lut(..., "lut")` para
+    fotogramas de 16 bits (la conversión a LAB se hace en coma flotante)"""
+    ramp = np.linspace(0, 1, 65536, dtype=np.float32)
+    gray = np.repeat(ramp.reshape(1, -1, 1), 3, axis=2)
+    lab = cv2.cvtColor(gray, cv2.COLOR_BGR2LAB)
+    lab[:, :, 0] = np.clip(lab[:, :, 0] * correction_factor, 0, 100)
+    bgr = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)[0, :, 0]
+    return np.round(np.clip(bgr, 0, 1) * 65535).astype(np.uint16)
+
+
+def _correct_brightness_16(image, correction_factor, mode, dst):
+    """Corrección de fotogramas de 16 bits: tabla de 65536 entradas o LAB en coma flotante"""
+    if len(image.shape) == 3 and mode != "lab":
+        table = correction_lut_16(round(correction_factor, 3))
+        return np.take(table, image) if dst is None else np.take(table, image, out=dst)
+
+    if len(image.shape) != 3:
+        result = np.clip(image.astype(np.float32) * correction_factor, 0, 65535).astype(np.uint16)
+    else:
+        lab = cv2.cvtColor(image.astype(np.float32) / 65535, cv2.COLOR_BGR2LAB)
+        lab[:, :, 0] = np.clip(lab[:, :, 0] * correction_factor, 0, 100)
+        bgr = np.clip(cv2.cvtColor(lab, cv2.COLOR_LAB2BGR), 0, 1) * 65535
+        result = np.round(bgr).astype(np.uint16)
+
+    if dst is None:
+        return result
+    dst[...] = result
+    return dst
+
+
+def correct_brightness(image, correction_factor, mode="lut", in_place=False):
+    """Escala la luminancia de una imagen por el factor de corrección mediante tablas LUT.
+
+    `mode="lab"` conserva el comportamiento de color de la corrección en LAB (con dos
+    conversiones de color); `mode="lut"` aplica una sola tabla a los canales BGR. Con
+    `in_place=True` el resultado se escribe sobre `image`. Los fotogramas de 16 bits
+    mantienen su profundidad.
+    """
+    if image is None:
+        return None
+
+    correction_factor = float(correction_factor)
+    dst = image if in_place and image.flags.writeable else None
+
+    if image.dtype == np.uint16:
+        return _correct_brightness_16(image, correction_factor, mode, dst)
+
+    if len(image.shape) != 3:
+        return cv2.LUT(image, correction_lut(correction_factor, "gray"), dst=dst)
+
+    if mode == "lab":
+        # Corrección en espacio LAB para mejor preservación del color (con el factor exacto)
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        cv2.LUT(lab, correction_lut(correction_factor, "lab"), dst=lab)
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=dst)
+
+    # Factores que difieren menos de 0.1% dan la misma tabla BGR
+    return cv2.LUT(image, correction_lut(round(correction_factor, 3), "lut"), dst=dst)
 
 
 class Deflickerer(QObject):
     progress_updated = Signal(int)
     preview_ready = Signal(int, np.ndarray)  # frame_index, processed_image
 
-    def __init__(self):
+    def __init__(self, max_workers=None, cache_dir=config.CACHE_DIR, frame_store_dir=config.FRAME_STORE_DIR):
         super().__init__()
-        self.processor = ImageProcessor()
+        self.processor = ImageProcessor(cache_dir=cache_dir)
         self.brightness_curve = []
         self.smoothing_method = "moving_average"
         self.smoothing_params = {}
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.frame_store_dir = frame_store_dir
+        self._running_job = None
+        # "reduced" mide el brillo sobre una decodificación reducida; "full" a resolución completa;
+        # "bayer" directamente sobre los datos del sensor de los RAW, sin revelar
+        self.analysis_mode = "reduced"
+        self.analysis_error = None
+        # Índice de la secuencia (SequenceManifest) donde guardar el brillo de cada fotograma
+        self.manifest = None
+        # Corrección por fotograma: "lut" (una tabla sobre BGR) o "lab" (solo el canal L en LAB)
+        self.correction_mode = "lut"
+        # Compensación de la exposición EXIF: "off", "normalize" (suavizar descontando los
+        # saltos de EV) o "replace" (predecir la curva solo con el EXIF, sin decodificar)
+        self.exposure_mode = "off"
+        self.exposure_curve = None
+        # Si ya se ha leído el EXIF de la secuencia (exposure_curve es None también sin EXIF)
+        self.exposure_read = False
+        # Brillo ya medido por fotograma: {(identidad del archivo, modo de análisis): brillo}
+        self.brightness_cache = {}
+
+    def cancel(self):
+        """Cancela el análisis o la corrección en curso"""
+        if self._running_job is not None:
+            self._running_job.cancel()
 
     def calculate_brightness(self, image):
         """Calcula el brillo promedio de una imagen usando diferentes métodos"""
-        if len(image.shape) == 3:
-            # Convertir a espacio de color LAB y usar el canal L (luminancia)
-            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-            l_channel = lab[:, :, 0]
-            return np.mean(l_channel)
-        else:
-            return np.mean(image)
+        return measure_brightness(image)
+
+    def get_correction_factor(self, frame_index, smoothed_curve):
+        """Factor de corrección entre el brillo suavizado y el original de un frame"""
+        original_brightness = self.brightness_curve[frame_index]
+        target_brightness = smoothed_curve[frame_index]
+
+        if original_brightness > 0:
+            return target_brightness / original_brightness
+        return 1.0
+
+    def _cache_key(self, image_path):
+        try:
+            return file_identity(image_path), self.analysis_mode
+        except OSError:
+            return None
+
+    def _cached_brightness(self, image_path, key):
+        """Brillo ya medido de un fotograma (memoria o índice de la secuencia), o None"""
+        if key is None:
+            return None
+        brightness = self.brightness_cache.get(key)
+        if brightness is None and self.manifest is not None:
+            entry = self.manifest.get(image_path)
+            # Solo vale si el índice corresponde a la versión actual del archivo
+            if entry is not None and (entry["size"], entry["mtime_ns"]) == key[0][1:]:
+                brightness = entry["brightness"].get(self.analysis_mode)
+                if brightness is not None:
+                    self.brightness_cache[key] = brightness
+        return brightness
+
+    def missing_brightness(self, image_sequence):
+        """Índices de los fotogramas cuyo brillo aún no se ha medido"""
+        return [i for i, image_path in enumerate(image_sequence)
+                if self._cached_brightness(image_path, self._cache_key(image_path)) is None]
 
     def get_brightness_curve(self, image_sequence):
-        """Calcula la curva de brillo para una secuencia de imágenes"""
-        self.brightness_curve = []
+        """Calcula la curva de brillo para una secuencia de imágenes.
+
+        Solo se decodifican los fotogramas que no están en la caché de resultados (en
+        memoria o en el índice de la secuencia); el resto se reutiliza.
+        """
         total = len(image_sequence)
+        keys = [self._cache_key(image_path) for image_path in image_sequence]
+        values = [self._cached_brightness(image_path, key) for image_path, key in zip(image_sequence, keys)]
+        missing = [i for i, value in enumerate(values) if value is None]
+
+        decode_mode = self.analysis_mode if self.analysis_mode in ("full", "bayer") else "analysis"
+        if not missing:
+            self.progress_updated.emit(100)
+            return self._finish_brightness_curve(image_sequence, values, decode_mode)
+
+        # El mismo grupo de procesos mide después la muestra de control a resolución completa
+        with ParallelDecoder(self.max_workers, cache_dir=self.cache_dir) as decoder:
+            done = total - len(missing)
+            self.progress_updated.emit(int(done / total * 100))
+            self._running_job = decoder
+            try:
+                brightness_values = decoder.imap([image_sequence[i] for i in missing], measure_brightness,
+                                                 decode_mode=decode_mode)
+                computed = 0
+                for i, brightness in zip(missing, brightness_values):
+                    computed += 1
+                    if brightness is not None:
+                        values[i] = brightness
+                        if keys[i] is not None:
+                            self.brightness_cache[keys[i]] = brightness
+                        if self.manifest is not None:
+                            self.manifest.set_brightness(image_sequence[i], self.analysis_mode, brightness)
+
+                    progress = int(((done + computed) / total) * 100)
+                    self.progress_updated.emit(progress)
+            finally:
+                self._running_job = None
+
+            if computed != len(missing):
+                # Análisis cancelado: la curva queda incompleta (hasta el primer fotograma sin medir)
+                first_missing = values.index(None) if None in values else total
+                self.brightness_curve = values[:first_missing]
+                return self.brightness_curve
+
+            return self._finish_brightness_curve(image_sequence, values, decode_mode, decoder)
+
+    def _finish_brightness_curve(self, image_sequence, values, decode_mode, decoder=None):
+        """Completa la curva con los valores medidos; `decoder` indica que se ha medido algo nuevo"""
+        # Si no podemos cargar una imagen, usar el valor anterior o 0
+        self.brightness_curve = []
+        for value in values:
+            if value is None:
+                value = self.brightness_curve[-1] if self.brightness_curve else 0
+            self.brightness_curve.append(value)
 
-        for i, image_path in enumerate(image_sequence):
-            image = self.processor.load_image(image_path)
-            if image is None:
-                # Si no podemos cargar la imagen, usar el valor anterior o 0
-                brightness = self.brightness_curve[-1] if self.brightness_curve else 0
-                self.brightness_curve.append(brightness)
-                continue
+        # El error del análisis reducido solo se vuelve a estimar si se ha medido algo nuevo
+        if decode_mode != "analysis":
+            self.analysis_error = None
+        elif decoder is not None:
+            self.analysis_error = None
+            self.estimate_analysis_error(image_sequence, decoder=decoder)
 
-            brightness = self.calculate_brightness(image)
-            self.brightness_curve.append(brightness)
+        if self.manifest is not None and self.manifest.dirty:
+            self.manifest.save()
 
-            progress = int(((i + 1) / total) * 100)
-            self.progress_updated.emit(progress)
+        return self.brightness_curve
 
+    def get_exposure_curve(self, image_sequence):
+        """Lee la exposición (en pasos) de cada fotograma del EXIF, sin decodificar imágenes"""
+        self.exposure_curve = exposure.read_exposure_curve(image_sequence, self.manifest)
+        self.exposure_read = True
+        return self.exposure_curve
+
+    def reset_exposure_curve(self):
+        """Olvida la exposición leída (la secuencia ha cambiado)"""
+        self.exposure_curve = None
+        self.exposure_read = False
+
+    def predict_brightness_curve(self, image_sequence):
+        """Curva de brillo prevista solo a partir de la exposición EXIF de cada fotograma.
+
+        Supone una escena constante: la corrección resultante elimina los saltos de
+        exposición sin medir ningún fotograma. Devuelve [] si no hay EXIF de exposición.
+        """
+        exposure_curve = self.get_exposure_curve(image_sequence)
+        if exposure_curve is None:
+            self.brightness_curve = []
+        else:
+            self.brightness_curve = exposure.predict_brightness(exposure_curve).tolist()
+        self.analysis_error = None
+        self.progress_updated.emit(100)
         return self.brightness_curve
 
+    def estimate_analysis_error(self, image_sequence, sample_size=config.ANALYSIS_VERIFY_SAMPLES, decoder=None):
+        """Compara el brillo del análisis reducido con el medido a resolución completa.
+
+        Mide a resolución completa una muestra de fotogramas repartidos por la secuencia y
+        guarda en `analysis_error` el error absoluto máximo y medio (escala 0-255). Reutiliza
+        `decoder` si se indica (el del análisis); si no, crea uno con como mucho un proceso
+        por fotograma de la muestra. Se puede cancelar con `cancel()`.
+        """
+        if not self.brightness_curve or sample_size <= 0:
+            return None
+
+        indices = sorted(set(np.linspace(0, len(self.brightness_curve) - 1, sample_size).astype(int)))
+        sample_paths = [image_sequence[i] for i in indices]
+
+        own_decoder = decoder is None
+        if own_decoder:
+            max_workers = min(self.max_workers or os.cpu_count() or 1, len(sample_paths))
+            decoder = ParallelDecoder(max_workers, cache_dir=self.cache_dir)
+        self._running_job = decoder
+        try:
+            full_values = list(decoder.imap(sample_paths, measure_brightness))
+        finally:
+            self._running_job = None
+            if own_decoder:
+                decoder.shutdown()
+        if decoder.is_cancelled():
+            return None
+
+        errors = [abs(self.brightness_curve[i] - full)
+                  for i, full in zip(indices, full_values) if full is not None]
+        if not errors:
+            return None
+
+        self.analysis_error = {
+            "samples": len(errors),
+            "max_abs_error": float(np.max(errors)),
+            "mean_abs_error": float(np.mean(errors)),
+        }
+        return self.analysis_error
+
     def set_smoothing_method(self, method, params=None):
         """Establecer el método de suavizado y sus parámetros"""
         self.smoothing_method = method
@@ -75,92 +351,14 @@ class Deflickerer(QObject):
         sigma = params.get('sigma', max(1, smoothing_level / 20))
         order = params.get('order', 3)
 
-        if method == "moving_average":
-            smoothed = self.moving_average_smooth(curve, window_size)
-        elif method == "gaussian":
-            smoothed = self.gaussian_smooth(curve, window_size, sigma)
-        elif method == "savitzky_golay":
-            smoothed = self.savitzky_golay_smooth(curve, window_size, order)
-        elif method == "wavelet":
-            smoothed = self.wavelet_smooth(curve, sigma)
-        elif method == "loess":
-            smoothed = self.loess_smooth(curve, window_size)
+        if (self.exposure_mode == "normalize" and self.exposure_curve is not None
+                and len(self.exposure_curve) == len(curve)):
+            smoothed = exposure.smooth_with_exposure(curve, self.exposure_curve, method, window_size, sigma, order)
         else:
-            smoothed = curve
+            smoothed = smoothing.smooth(curve, method, window_size, sigma, order)
 
         return smoothed.tolist()
 
-    def moving_average_smooth(self, data, window_size):
-        """Suavizado por media móvil con manejo de bordes"""
-        half_window = window_size // 2
-        smoothed = np.zeros_like(data, dtype=np.float64)
-
-        for i in range(len(data)):
-            start = max(0, i - half_window)
-            end = min(len(data), i + half_window + 1)
-            smoothed[i] = np.mean(data[start:end])
-
-        return smoothed
-
-    def gaussian_smooth(self, data, window_size, sigma):
-        """Suavizado con filtro gaussiano"""
-        # Crear kernel gaussiano
-        x = np.arange(-window_size // 2, window_size // 2 + 1)
-        kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
-        kernel /= np.sum(kernel)
-
-        # Aplicar convolución
-        smoothed = np.convolve(data, kernel, mode='same')
-        return smoothed
-
-    def savitzky_golay_smooth(self, data, window_size, order):
-        """Suavizado con filtro Savitzky-Golay (preserva mejor los picos)"""
-        if len(data) < window_size:
-            return data
-
-        return signal.savgol_filter(data, window_size, order)
-
-    def wavelet_smooth(self, data, sigma):
-        """Suavizado usando transformada wavelet"""
-        if not HAS_PYWT:
-            print("Advertencia: pywt no instalado. Usando media móvil como alternativa.")
-            return self.moving_average_smooth(data, 21)
-
-        try:
-            import pywt
-            # Descomposición wavelet
-            coeffs = pywt.wavedec(data, 'db4', level=4)
-            # Umbralizado de coeficientes
-            coeffs[1:] = [pywt.threshold(c, sigma * np.std(c), 'soft') for c in coeffs[1:]]
-            # Reconstrucción
-            smoothed = pywt.waverec(coeffs, 'db4')
-            # Ajustar longitud si es necesario
-            if len(smoothed) > len(data):
-                smoothed = smoothed[:len(data)]
-            elif len(smoothed) < len(data):
-                smoothed = np.pad(smoothed, (0, len(data) - len(smoothed)), 'edge')
-
-            return smoothed
-        except Exception as e:
-            print(f"Error en suavizado wavelet: {e}")
-            return self.moving_average_smooth(data, 21)
-
-    def loess_smooth(self, data, window_size):
-        """Suavizado LOESS (regresión local)"""
-        if not HAS_STATSMODELS:
-            print("Advertencia: statsmodels no instalado. Usando media móvil como alternativa.")
-            return self.moving_average_smooth(data, window_size)
-
-        try:
-            from statsmodels.nonparametric.smoothers_lowess import lowess
-            x = np.arange(len(data))
-            frac = window_size / len(data)
-            smoothed = lowess(data, x, frac=frac, it=0, return_sorted=False)
-            return smoothed
-        except Exception as e:
-            print(f"Error en suavizado LOESS: {e}")
-            return self.moving_average_smooth(data, window_size)
-
     def generate_preview(self, frame_index, image_sequence, smoothed_curve):
         """Generar una previsualización del frame con la corrección aplicada"""
         if (not image_sequence or frame_index >= len(image_sequence) or
@@ -175,60 +373,52 @@ class Deflickerer(QObject):
             return None
 
         # Calcular factor de corrección
-        original_brightness = self.brightness_curve[frame_index]
-        target_brightness = smoothed_curve[frame_index]
-
-        if original_brightness > 0:
-            correction_factor = target_brightness / original_brightness
-        else:
-            correction_factor = 1.0
+        correction_factor = self.get_correction_factor(frame_index, smoothed_curve)
 
         print(f"Corrección aplicada: factor {correction_factor:.2f}")
 
-        # Aplicar corrección en espacio LAB para mejor preservación del color
-        if len(image.shape) == 3:
-            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-            lab[:, :, 0] = np.clip(lab[:, :, 0].astype(np.float32) * correction_factor, 0, 255).astype(np.uint8)
-            corrected_image = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-        else:
-            corrected_image = np.clip(image.astype(np.float32) * correction_factor, 0, 255).astype(np.uint8)
+        return correct_brightness(image, correction_factor, self.correction_mode, in_place=True)
 
-        return corrected_image
+    def correct_source(self, source, smoothed_curve):
+        """Añade la corrección de deflicker como transformación perezosa de un FrameSource"""
+        if len(smoothed_curve) != len(self.brightness_curve):
+            raise ValueError("La curva suavizada debe tener la misma longitud que la secuencia de imágenes")
+
+        factors = [(self.get_correction_factor(i, smoothed_curve),) for i in range(len(smoothed_curve))]
+        # Los fotogramas de PathFrameSource se decodifican de nuevo en cada pasada y se pueden
+        # corregir en su sitio; los de otras fuentes (FrameStore, listas) no se deben modificar
+        in_place = isinstance(source, PathFrameSource)
+        return source.map(correct_brightness, self.correction_mode, in_place, per_frame_args=factors)
 
     def apply_correction(self, image_sequence, smoothed_curve):
-        """Aplica la corrección de brillo a la secuencia de imágenes"""
-        processed_images = []
+        """Aplica la corrección de brillo a la secuencia de imágenes.
+
+        Los fotogramas corregidos se escriben en un FrameStore en disco a medida que se
+        generan, así que la memoria no depende de la longitud de la secuencia.
+        """
         total = len(image_sequence)
 
         if len(smoothed_curve) != total:
             raise ValueError("La curva suavizada debe tener la misma longitud que la secuencia de imágenes")
 
-        for i, image_path in enumerate(image_sequence):
-            image = self.processor.load_image(image_path)
-            if image is None:
-                processed_images.append(None)
-                continue
+        # La corrección se hace en los procesos trabajadores junto con la decodificación
+        source = self.correct_source(
+            PathFrameSource(image_sequence, max_workers=self.max_workers, cache_dir=self.cache_dir),
+            smoothed_curve
+        )
+        processed_images = FrameStore(total, self.frame_store_dir)
 
-            # Calcular factor de corrección
-            original_brightness = self.brightness_curve[i]
-            target_brightness = smoothed_curve[i]
-
-            if original_brightness > 0:
-                correction_factor = target_brightness / original_brightness
-            else:
-                correction_factor = 1.0
-
-            # Aplicar corrección en espacio LAB para mejor preservación del color
-            if len(image.shape) == 3:
-                lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-                lab[:, :, 0] = np.clip(lab[:, :, 0].astype(np.float32) * correction_factor, 0, 255).astype(np.uint8)
-                corrected_image = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-            else:
-                corrected_image = np.clip(image.astype(np.float32) * correction_factor, 0, 255).astype(np.uint8)
-
-            processed_images.append(corrected_image)
-
-            progress = int(((i + 1) / total) * 100)
-            self.progress_updated.emit(progress)
-
-        return processed_images
\ No newline at end of file
+        self._running_job = source
+        try:
+            for i, corrected_image in enumerate(source):
+                processed_images[i] = corrected_image
+
+                progress = int(((i + 1) / total) * 100)
+                self.progress_updated.emit(progress)
+        except Exception:
+            processed_images.close()
+            raise
+        finally:
+            self._running_job = None
+
+        return processed_images
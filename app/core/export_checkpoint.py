@@ -0,0 +1,128 @@
+# app/core/export_checkpoint.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from app.utils.file_utils import file_identity
+from .frame_source import PathFrameSource
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = ".lapsefy-segments"
+
+
+def source_fingerprint(source):
+    """Huella de una fuente de fotogramas: archivos (ruta, tamaño, fecha) y transformaciones.
+
+    Solo se puede calcular para PathFrameSource; para fotogramas en memoria devuelve None
+    (no hay forma barata de saber si su contenido es el mismo).
+    """
+    if not isinstance(source, PathFrameSource):
+        return None
+
+    digest = hashlib.sha1()
+    digest.update(f"{source.decode_mode}/{source.reduction}".encode("utf-8"))
+    for index in source.source_indices():
+        try:
+            identity = file_identity(source.image_paths[index])
+        except OSError:
+            return None
+        digest.update(repr(identity).encode("utf-8"))
+        for func, args in source.transform_chain(index):
+            digest.update(f"{func.__module__}.{func.__qualname__}{args!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def settings_hash(fingerprint, **settings):
+    """Hash de la fuente y de todos los ajustes que afectan a los segmentos codificados"""
+    payload = json.dumps({"source": fingerprint, **settings}, sort_keys=True, default=repr)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SegmentCheckpoint:
+    """Segmentos terminados de una exportación, guardados en `<salida>.lapsefy-segments/`.
+
+    `manifest.json` registra el hash de los ajustes y, por cada segmento terminado, su rango
+    de fotogramas, archivo y tamaño. Al relanzar con los mismos ajustes solo se codifican los
+    segmentos que faltan; si los ajustes cambian se descarta todo lo anterior. `commit` se
+    puede llamar a la vez desde varios hilos de codificación.
+    """
+
+    def __init__(self, output_path, settings_hash):
+        self.directory = os.path.abspath(output_path) + CHECKPOINT_SUFFIX
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self.settings_hash = settings_hash
+        self.segments = {}
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Crea o reutiliza el directorio; devuelve los índices de los segmentos ya terminados"""
+        manifest = None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Punto de control no válido ({self.manifest_path}): {e}")
+
+        if (manifest is None or manifest.get("version") != CHECKPOINT_VERSION
+                or manifest.get("settings_hash") != self.settings_hash):
+            if os.path.isdir(self.directory):
+                shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+            self.segments = {}
+            self._save()
+            return set()
+
+        self.segments = {}
+        for index, segment in manifest.get("segments", {}).items():
+            path = os.path.join(self.directory, segment["file"])
+            if os.path.isfile(path) and os.path.getsize(path) == segment["size"]:
+                self.segments[int(index)] = segment
+        self._remove_partial_files()
+        return set(self.segments)
+
+    def segment_path(self, index, extension):
+        return os.path.join(self.directory, f"segment_{index:04d}{extension}")
+
+    def partial_path(self, index, extension):
+        """Archivo donde se codifica el segmento hasta terminar (FFmpeg usa la extensión)"""
+        return os.path.join(self.directory, f"segment_{index:04d}.part{extension}")
+
+    def commit(self, index, start, end, extension):
+        """Marca un segmento como terminado: lo lleva a disco, lo renombra y guarda el manifiesto"""
+        path = self.segment_path(index, extension)
+        partial_path = self.partial_path(index, extension)
+        # Que el manifiesto nunca apunte a un segmento que un corte de luz pueda dejar incompleto
+        with open(partial_path, "r+b") as f:
+            os.fsync(f.fileno())
+        os.replace(partial_path, path)
+        segment = {"start": start, "end": end, "file": os.path.basename(path),
+                   "size": os.path.getsize(path)}
+        with self._lock:
+            self.segments[index] = segment
+            self._save()
+
+    def _save(self):
+        data = {"version": CHECKPOINT_VERSION, "settings_hash": self.settings_hash,
+                "segments": {str(index): segment for index, segment in sorted(self.segments.items())}}
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+    def _remove_partial_files(self):
+        for name in os.listdir(self.directory):
+            if ".part" in name:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def remove(self):
+        """Borra los puntos de control (la exportación ha terminado)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -5,6 +5,8 @@ from .video_exporter import VideoExporter
 
 class ExportThread(QThread):
     progress = Signal(int)
+    # Estadísticas de exportación (ver ExportProgress): fotogramas, fps, velocidad, ETA, cola...
+    stats_updated = Signal(dict)
     finished = Signal(bool)
     error = Signal(str)
 
@@ -16,10 +18,10 @@ class ExportThread(QThread):
         self.resolution = resolution
         self.codec = codec
         self.exporter = VideoExporter()
-        self.exporter.progress_updated.connect(self.handle_progress)
 
-    def handle_progress(self, value):
-        self.progress.emit(value)
+    def handle_progress(self, stats):
+        self.progress.emit(stats["progress"])
+        self.stats_updated.emit(stats)
 
     def run(self):
         try:
@@ -28,9 +30,10 @@ class ExportThread(QThread):
                 self.output_path,
                 self.fps,
                 self.resolution,
-                self.codec
+                self.codec,
+                progress_callback=self.handle_progress
             )
             self.finished.emit(success)
         except Exception as e:
             self.error.emit(str(e))
-            self.finished.emit(False)
\ No newline at end of file
+            self.finished.emit(False)
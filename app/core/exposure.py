@@ -0,0 +1,127 @@
+# app/core/exposure.py
+"""Curva de exposición (EV) a partir del EXIF, sin decodificar ninguna imagen.
+
+En secuencias día-noche la exposición cambia por saltos (ISO, obturador, diafragma).
+Con la exposición de cada fotograma se puede normalizar la curva de brillo medida antes
+de suavizarla, o predecir la curva completa solo con los metadatos.
+"""
+import numpy as np
+
+from . import smoothing
+from .sequence_manifest import read_frame_metadata
+
+# Brillo lineal del fotograma de referencia al predecir la curva (gris medio)
+REFERENCE_LUMINANCE = 0.18
+
+
+def parse_exif_number(value):
+    """Convierte un valor EXIF de pyexiv2 ('1/250', '28/10', '100 100') a float"""
+    if value is None:
+        return None
+    try:
+        value = str(value).split()[0]
+        if '/' in value:
+            numerator, denominator = value.split('/', 1)
+            denominator = float(denominator)
+            return float(numerator) / denominator if denominator else None
+        return float(value)
+    except (ValueError, IndexError):
+        return None
+
+
+def exposure_offset(exif):
+    """Exposición del fotograma en pasos: log2(tiempo * ISO/100 / f²).
+
+    Un paso más significa el doble de luz en el sensor para la misma escena.
+    Devuelve None si falta algún dato.
+    """
+    exposure_time = parse_exif_number(exif.get('Exif.Photo.ExposureTime'))
+    f_number = parse_exif_number(exif.get('Exif.Photo.FNumber'))
+    iso = parse_exif_number(exif.get('Exif.Photo.ISOSpeedRatings'))
+    if not exposure_time or not f_number or not iso or exposure_time <= 0 or f_number <= 0 or iso <= 0:
+        return None
+    return float(np.log2(exposure_time * iso / 100 / f_number ** 2))
+
+
+def read_exposure_curve(image_sequence, manifest=None):
+    """Exposición en pasos de cada fotograma, leída del índice de la secuencia o con pyexiv2.
+
+    Los fotogramas sin datos toman el valor interpolado de sus vecinos. Devuelve None si
+    ningún fotograma tiene EXIF de exposición.
+    """
+    offsets = np.full(len(image_sequence), np.nan)
+    for i, image_path in enumerate(image_sequence):
+        entry = manifest.get(image_path) if manifest is not None else None
+        exif = entry.get("exif") if entry is not None else read_frame_metadata(image_path)["exif"]
+        offset = exposure_offset(exif or {})
+        if offset is not None:
+            offsets[i] = offset
+
+    known = ~np.isnan(offsets)
+    if not known.any():
+        return None
+    if not known.all():
+        positions = np.arange(len(offsets))
+        offsets = np.interp(positions, positions[known], offsets[known])
+    return offsets
+
+
+def linear_to_lightness(luminance):
+    """Convierte luminancia lineal (0-1) a L* de CIELAB en la escala 0-255 de OpenCV"""
+    luminance = np.clip(luminance, 0, 1)
+    lightness = np.where(luminance > 0.008856, 116 * np.cbrt(luminance) - 16, 903.3 * luminance)
+    return lightness * 255 / 100
+
+
+def lightness_to_linear(lightness):
+    """Inversa de `linear_to_lightness`"""
+    lightness = np.clip(np.asarray(lightness, dtype=np.float64) * 100 / 255, 0, 100)
+    return np.where(lightness > 8.0, ((lightness + 16) / 116) ** 3, lightness / 903.3)
+
+
+def predict_brightness(exposure_curve):
+    """Brillo (escala 0-255) esperado para cada fotograma si la escena no cambiase.
+
+    El fotograma de exposición mediana se sitúa en gris medio; el resto se desplaza según
+    su diferencia de exposición en pasos.
+    """
+    exposure_curve = np.asarray(exposure_curve, dtype=np.float64)
+    relative = exposure_curve - np.median(exposure_curve)
+    return linear_to_lightness(REFERENCE_LUMINANCE * 2 ** relative)
+
+
+def exposure_ramp(exposure_curve, tolerance=0.01):
+    """Convierte los saltos de exposición en una rampa lineal.
+
+    Cada tramo de exposición constante aporta un punto de control en su centro y entre
+    centros se interpola linealmente, de modo que cada salto se reparte entre los dos
+    tramos que separa.
+    """
+    exposure_curve = np.asarray(exposure_curve, dtype=np.float64)
+    n = len(exposure_curve)
+    if n < 2:
+        return exposure_curve.copy()
+
+    boundaries = np.flatnonzero(np.abs(np.diff(exposure_curve)) > tolerance) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [n]))
+    centers = (starts + ends - 1) / 2
+    return np.interp(np.arange(n), centers, exposure_curve[starts])
+
+
+def smooth_with_exposure(curve, exposure_curve, method, window_size=21, sigma=2.0, order=3):
+    """Suaviza la curva de brillo descontando los saltos de exposición.
+
+    Se pasa el brillo a luz de escena (lineal, dividido por la exposición), se suaviza en
+    ese dominio y se vuelve a aplicar la exposición como rampa (`exposure_ramp`): los
+    saltos de ISO, obturador o diafragma se convierten en una transición continua.
+    """
+    curve = np.asarray(curve, dtype=np.float64)
+    exposure_curve = np.asarray(exposure_curve, dtype=np.float64)
+    if len(curve) != len(exposure_curve):
+        raise ValueError("La curva de exposición debe tener la misma longitud que la de brillo")
+
+    # En escala logarítmica el suavizado trata igual las zonas claras y las oscuras
+    scene = np.log2(np.maximum(lightness_to_linear(curve), 1e-6)) - exposure_curve
+    smoothed_scene = smoothing.smooth(scene, method, window_size, sigma, order)
+    return linear_to_lightness(2 ** (smoothed_scene + exposure_ramp(exposure_curve)))
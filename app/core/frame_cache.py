@@ -0,0 +1,235 @@
+# app/core/frame_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.utils.file_utils import file_identity
+
+
+class DiskFrameCache:
+    """Caché persistente en disco de fotogramas revelados, direccionada por contenido.
+
+    La clave combina la identidad del archivo (ruta, tamaño, fecha de modificación) con
+    los parámetros de revelado, de modo que cualquier cambio invalida la entrada. El
+    tamaño total se limita a `max_bytes` eliminando las entradas usadas hace más tiempo,
+    pero nunca las usadas desde que se creó la caché: si no hay sitio sin tocarlas, el
+    fotograma nuevo no se guarda. Así una pasada secuencial sobre más fotogramas de los
+    que caben conserva el principio de la secuencia en lugar de vaciar la caché entera.
+    Varios procesos pueden compartir el mismo directorio.
+    """
+
+    def __init__(self, cache_dir, max_bytes, rescan_interval=60.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Cada cuánto se vuelve a recorrer el directorio (otros procesos también escriben)
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        # Índice de las entradas {ruta: (mtime_ns, tamaño)}, de la usada hace más tiempo a la más reciente
+        self._entries = None
+        self._total_bytes = 0
+        self._scanned_at = 0.0
+        self._session_start_ns = time.time_ns()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, image_path, develop_params):
+        """Genera la clave de caché para un archivo y unos parámetros de revelado"""
+        try:
+            identity = file_identity(image_path)
+        except OSError:
+            return None
+        params = repr(sorted(develop_params.items()))
+        return hashlib.sha1(repr((identity, params)).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, image_path, develop_params):
+        """Devuelve el fotograma revelado si está en caché, o None"""
+        key = self.make_key(image_path, develop_params)
+        if key is None:
+            return None
+
+        entry_path = self._entry_path(key)
+        try:
+            image = np.load(entry_path, allow_pickle=False)
+            # Actualizar la fecha de modificación para la política LRU
+            os.utime(entry_path, None)
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            if self._entries is not None and entry_path in self._entries:
+                self._entries[entry_path] = (time.time_ns(), self._entries[entry_path][1])
+                self._entries.move_to_end(entry_path)
+        return image
+
+    def put(self, image_path, develop_params, image):
+        """Guarda un fotograma revelado de forma atómica si hay sitio para él"""
+        key = self.make_key(image_path, develop_params)
+        if key is None or image is None:
+            return
+
+        # Reservar el espacio antes de escribir (cabecera .npy incluida)
+        reserved = image.nbytes + 128
+        with self._lock:
+            if not self._make_room(reserved):
+                return
+            self._total_bytes += reserved
+
+        entry_path = self._entry_path(key)
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, image, allow_pickle=False)
+            os.replace(temp_path, entry_path)
+            size = os.path.getsize(entry_path)
+        except OSError as e:
+            print(f"Error al guardar en la caché de disco: {e}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            with self._lock:
+                self._total_bytes -= reserved
+            return
+
+        with self._lock:
+            previous = self._entries.pop(entry_path, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+            self._entries[entry_path] = (time.time_ns(), size)
+            self._total_bytes += size - reserved
+
+    def _list_entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".npy") and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def _load_index(self):
+        """Carga el índice recorriendo el directorio si no existe o ha caducado"""
+        now = time.monotonic()
+        if self._entries is None or now - self._scanned_at >= self.rescan_interval:
+            self._entries = OrderedDict((path, (mtime, size)) for mtime, size, path in sorted(self._list_entries()))
+            self._total_bytes = sum(size for _, size in self._entries.values())
+            self._scanned_at = now
+
+    def _make_room(self, size):
+        """Elimina entradas antiguas hasta que quepan `size` bytes; False si no es posible"""
+        self._load_index()
+        while self._entries and self._total_bytes + size > self.max_bytes:
+            path, (mtime, entry_size) = next(iter(self._entries.items()))
+            if mtime >= self._session_start_ns:
+                # El resto del índice también se ha usado en esta sesión: no se desaloja
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error al limpiar la caché de disco: {e}")
+                break
+            del self._entries[path]
+            self._total_bytes -= entry_size
+        return self._total_bytes + size <= self.max_bytes
+
+    def clear(self):
+        """Elimina todas las entradas de la caché"""
+        with self._lock:
+            for _, _, path in self._list_entries():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._entries = OrderedDict()
+            self._total_bytes = 0
+            self._scanned_at = time.monotonic()
+
+
+class MemoryFrameCache:
+    """Caché LRU en memoria de fotogramas decodificados, limitada por bytes.
+
+    Es segura para usar desde varios hilos. Los fotogramas se guardan como arrays de
+    solo lectura, lo que permite devolver vistas sin copiar en cada acierto.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, copy=False):
+        """Devuelve el fotograma (vista de solo lectura o copia) o None si no está"""
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return image.copy() if copy else image
+
+    def put(self, key, image):
+        """Guarda un fotograma y devuelve la versión de solo lectura almacenada"""
+        if image is None:
+            return None
+
+        image = image.view()
+        image.flags.writeable = False
+        size = image.nbytes
+        if size > self.max_bytes:
+            # Un único fotograma mayor que el presupuesto no se guarda
+            return image
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+
+            self._entries[key] = image
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
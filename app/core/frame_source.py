@@ -0,0 +1,206 @@
+# app/core/frame_source.py
+import cv2
+
+from app.utils import config
+from .image_processor import ImageProcessor, adjust_exposure_contrast
+from .parallel_decoder import ParallelDecoder
+from .pipeline import ordered_map
+
+
+def resize_frame(image, width, height):
+    """Redimensiona un fotograma al tamaño indicado (INTER_AREA para reducir)"""
+    if image is None:
+        return None
+    if image.shape[1] == width and image.shape[0] == height:
+        return image
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def apply_transform_chain(image, chain):
+    """Aplica una cadena de transformaciones [(func, args), ...] a un fotograma"""
+    for func, args in chain:
+        if image is None:
+            return None
+        image = func(image, *args)
+    return image
+
+
+class FrameTransform:
+    """Transformación perezosa de fotogramas: `func(image, *args)`.
+
+    `func` debe ser una función de nivel de módulo para poder ejecutarse en procesos
+    trabajadores. `per_frame_args[i]` aporta argumentos propios del fotograma i de la
+    secuencia original (por ejemplo el factor de corrección de deflicker).
+    """
+
+    def __init__(self, func, *args, per_frame_args=None):
+        self.func = func
+        self.args = args
+        self.per_frame_args = per_frame_args
+
+    def arguments(self, index):
+        if self.per_frame_args is None:
+            return self.args
+        return tuple(self.per_frame_args[index]) + self.args
+
+
+class FrameSource:
+    """Secuencia perezosa de fotogramas.
+
+    Admite len, índices, slicing e iteración; los fotogramas se obtienen bajo demanda y
+    las transformaciones (`map`, `adjust`, `resize`...) se componen sin materializar nada.
+    Las subclases implementan `_load(index)` sobre la secuencia original.
+    """
+
+    def __init__(self, length, transforms=None, indices=None):
+        self._length = length
+        self.transforms = list(transforms or [])
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices) if self.indices is not None else self._length
+
+    def source_index(self, index):
+        """Índice en la secuencia original del fotograma `index` de esta vista"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Índice de fotograma fuera de rango")
+        return self.indices[index] if self.indices is not None else index
+
+    def source_indices(self):
+        return self.indices if self.indices is not None else range(self._length)
+
+    def _load(self, index):
+        raise NotImplementedError
+
+    def _copy(self, transforms=None, indices=None):
+        raise NotImplementedError
+
+    def transform_chain(self, index):
+        """Cadena de transformaciones a aplicar al fotograma original `index`"""
+        return tuple((t.func, t.arguments(index)) for t in self.transforms)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._copy(indices=[self.source_index(i) for i in range(*index.indices(len(self)))])
+
+        index = self.source_index(index)
+        return apply_transform_chain(self._load(index), self.transform_chain(index))
+
+    def __iter__(self):
+        for index in self.source_indices():
+            yield apply_transform_chain(self._load(index), self.transform_chain(index))
+
+    def map(self, func, *args, per_frame_args=None):
+        """Devuelve una nueva fuente con la transformación añadida al final"""
+        transform = FrameTransform(func, *args, per_frame_args=per_frame_args)
+        return self._copy(transforms=self.transforms + [transform])
+
+    def adjust(self, exposure=0, contrast=0):
+        """Ajuste de exposición y contraste (sin coste si ambos son 0)"""
+        if exposure == 0 and contrast == 0:
+            return self
+        return self.map(adjust_exposure_contrast, exposure, contrast)
+
+    def resize(self, width, height):
+        return self.map(resize_frame, width, height)
+
+    def materialize(self):
+        """Decodifica y transforma toda la secuencia en una lista"""
+        return list(self)
+
+    def cancel(self):
+        """Detiene una iteración en curso (si la fuente lo permite)"""
+        pass
+
+
+class PathFrameSource(FrameSource):
+    """Fotogramas decodificados bajo demanda a partir de rutas de archivo.
+
+    La iteración completa decodifica y aplica las transformaciones en procesos
+    trabajadores (ParallelDecoder), entregando los fotogramas en orden.
+    """
+
+    def __init__(self, image_paths, decode_mode="full", max_workers=None, cache_dir=config.CACHE_DIR,
+                 transforms=None, indices=None, reduction=config.ANALYSIS_REDUCTION):
+        super().__init__(len(image_paths), transforms, indices)
+        self.image_paths = image_paths
+        self.decode_mode = decode_mode
+        self.reduction = reduction
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self._processor = None
+        self._decoder = None
+
+    def _copy(self, transforms=None, indices=None):
+        return PathFrameSource(self.image_paths, self.decode_mode, self.max_workers, self.cache_dir,
+                               self.transforms if transforms is None else transforms,
+                               self.indices if indices is None else indices, self.reduction)
+
+    def with_decode_mode(self, decode_mode, reduction=config.ANALYSIS_REDUCTION):
+        """La misma vista y transformaciones con otra decodificación (p. ej. "analysis" a
+        1/`reduction` del tamaño para un borrador)"""
+        return PathFrameSource(self.image_paths, decode_mode, self.max_workers, self.cache_dir,
+                               self.transforms, self.indices, reduction)
+
+    def _load(self, index):
+        if self._processor is None:
+            self._processor = ImageProcessor(cache_dir=self.cache_dir)
+        image_path = self.image_paths[index]
+        if self.decode_mode == "analysis":
+            return self._processor.load_analysis_image(image_path, self.reduction)
+        if self.decode_mode == "full16":
+            return self._processor.load_image_16(image_path)
+        return self._processor.load_image(image_path, use_cache=False)
+
+    def paths(self):
+        """Rutas de los fotogramas de esta vista"""
+        return [self.image_paths[i] for i in self.source_indices()]
+
+    def __iter__(self):
+        indices = list(self.source_indices())
+        chains = [(self.transform_chain(i),) for i in indices]
+
+        with ParallelDecoder(self.max_workers, cache_dir=self.cache_dir) as decoder:
+            self._decoder = decoder
+            try:
+                yield from decoder.imap([self.image_paths[i] for i in indices], apply_transform_chain, chains,
+                                        decode_mode=self.decode_mode, reduction=self.reduction)
+            finally:
+                self._decoder = None
+
+    def cancel(self):
+        if self._decoder is not None:
+            self._decoder.cancel()
+
+
+class ArrayFrameSource(FrameSource):
+    """Fotogramas ya decodificados (lista o FrameStore) vistos como FrameSource.
+
+    Al iterar, las transformaciones se aplican en un pool de hilos (OpenCV libera el GIL)
+    y los fotogramas se entregan en orden.
+    """
+
+    def __init__(self, frames, transforms=None, indices=None, max_workers=None):
+        super().__init__(len(frames), transforms, indices)
+        self.frames = frames
+        self.max_workers = max_workers
+
+    def _copy(self, transforms=None, indices=None):
+        return ArrayFrameSource(self.frames,
+                                self.transforms if transforms is None else transforms,
+                                self.indices if indices is None else indices,
+                                self.max_workers)
+
+    def _load(self, index):
+        return self.frames[index]
+
+    def _prepare(self, index):
+        return apply_transform_chain(self._load(index), self.transform_chain(index))
+
+    def __iter__(self):
+        if not self.transforms:
+            yield from (self._load(index) for index in self.source_indices())
+            return
+        yield from ordered_map(self._prepare, self.source_indices(), self.max_workers)
@@ -0,0 +1,126 @@
+# app/core/frame_store.py
+import mmap
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from app.utils import config
+
+
+class FrameStore:
+    """Secuencia de fotogramas guardada en un archivo mapeado en memoria.
+
+    Se comporta como una lista de longitud fija (len, índices, iteración) pero los
+    fotogramas viven en disco, así que la memoria residente no crece con la longitud
+    de la secuencia. El archivo se reserva al escribir el primer fotograma, que fija
+    la forma de todos los demás; los fotogramas ausentes se devuelven como None.
+    """
+
+    def __init__(self, length, directory=config.FRAME_STORE_DIR, release_interval=16):
+        self.length = length
+        self.directory = directory
+        self.release_interval = release_interval
+        self.path = None
+        self.frame_shape = None
+        self.dtype = None
+        self._file = None
+        self._mmap = None
+        self._frames = None
+        self._valid = np.zeros(length, dtype=bool)
+        self._accesses = 0
+
+    def __len__(self):
+        return self.length
+
+    def _allocate(self, image):
+        self.frame_shape = image.shape
+        self.dtype = image.dtype
+        frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        total_bytes = max(1, frame_bytes * self.length)
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="lapsefy_frames_", suffix=".raw", dir=self.directory)
+        self._file = os.fdopen(fd, "w+b")
+        self._file.truncate(total_bytes)
+        self._mmap = mmap.mmap(self._file.fileno(), total_bytes)
+        self._frames = np.ndarray((self.length,) + self.frame_shape, dtype=self.dtype, buffer=self._mmap)
+
+    def _normalize_index(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("Índice de fotograma fuera de rango")
+        return index
+
+    def __setitem__(self, index, image):
+        index = self._normalize_index(index)
+        if image is None:
+            self._valid[index] = False
+            return
+
+        if self._frames is None:
+            self._allocate(image)
+
+        if image.shape != self.frame_shape:
+            # Todos los fotogramas deben tener la forma del primero
+            image = cv2.resize(image, (self.frame_shape[1], self.frame_shape[0]), interpolation=cv2.INTER_AREA)
+        self._frames[index] = image
+        self._valid[index] = True
+        self._count_access()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+
+        index = self._normalize_index(index)
+        if self._frames is None or not self._valid[index]:
+            return None
+        self._count_access()
+        return self._frames[index]
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+    def _count_access(self):
+        self._accesses += 1
+        if self.release_interval and self._accesses % self.release_interval == 0:
+            self.release_memory()
+
+    def release_memory(self):
+        """Escribe las páginas modificadas y las libera de la memoria residente"""
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        if hasattr(mmap, "MADV_DONTNEED"):
+            # Las páginas se volverán a leer del archivo cuando se necesiten
+            self._mmap.madvise(mmap.MADV_DONTNEED)
+
+    def close(self):
+        """Libera el archivo mapeado y lo elimina del disco"""
+        self._frames = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Aún hay vistas de fotogramas en uso; el sistema liberará el mapeo
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                print(f"No se pudo eliminar el almacén de fotogramas {self.path}: {e}")
+        self.path = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
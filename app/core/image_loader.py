@@ -1,43 +1,89 @@
 # app/core/image_loader.py
 import os
-import threading
+import time
 from PySide6.QtCore import QObject, Signal
-import cv2
+
+from app.utils.file_utils import IMAGE_EXTENSIONS, natural_sort_key
 
 
 class ImageLoader(QObject):
     progress_updated = Signal(int, str)  # progreso, mensaje
+    batch_found = Signal(list)  # lote de rutas encontradas durante la exploración
     finished = Signal(list)  # lista de rutas de imágenes
 
-    def __init__(self):
+    def __init__(self, batch_size=500, progress_interval=0.25):
         super().__init__()
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        # Tamaño y fecha de modificación de cada archivo encontrado. Solo en Windows, donde
+        # scandir los trae en la propia entrada del directorio; en POSIX costarían un stat()
+        # por archivo y el índice de la secuencia ya los obtiene cuando los necesita
+        self.file_stats = {}
+        self._is_cancelled = False
+
+    def cancel(self):
+        self._is_cancelled = True
 
-    def load_images(self, folder):
-        """Carga imágenes desde una carpeta en un hilo separado"""
-        supported_formats = ['.jpg', '.jpeg', '.png', '.tiff', '.raw', '.cr2', '.nef', '.arw', '.raf']
+    def load_images(self, folder, recursive=False):
+        """Explora una carpeta (opcionalmente de forma recursiva) emitiendo las imágenes por lotes"""
+        self._is_cancelled = False
+        self.file_stats = {}
         image_files = []
+        batch = []
+        scanned = 0
+        last_progress = 0.0
+        pending_dirs = [folder]
+
+        while pending_dirs and not self._is_cancelled:
+            directory = pending_dirs.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        scanned += 1
+                        # Limitar la frecuencia de las señales de progreso (también en carpetas
+                        # llenas de archivos que no son imágenes)
+                        now = time.monotonic()
+                        if now - last_progress >= self.progress_interval:
+                            last_progress = now
+                            self.progress_updated.emit(
+                                0, f"Explorando archivos: {scanned} revisados, "
+                                   f"{len(image_files) + len(batch)} imágenes")
 
-        # Obtener lista de archivos
-        try:
-            files = os.listdir(folder)
-            total_files = len(files)
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                pending_dirs.append(entry.path)
+                            continue
 
-            for i, file in enumerate(files):
-                if any(file.lower().endswith(ext) for ext in supported_formats):
-                    image_files.append(os.path.join(folder, file))
+                        if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                            continue
 
-                # Emitir progreso
-                progress = int(((i + 1) / total_files) * 50)  # La exploración es la primera mitad
-                self.progress_updated.emit(progress, f"Explorando archivos: {i + 1}/{total_files}")
+                        if os.name == 'nt':
+                            stat = entry.stat()
+                            self.file_stats[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                        batch.append(entry.path)
 
-        except Exception as e:
-            self.progress_updated.emit(0, f"Error al explorar carpeta: {str(e)}")
-            self.finished.emit([])
-            return
+                        if len(batch) >= self.batch_size:
+                            image_files.extend(self._emit_batch(batch))
+                            batch = []
+            except OSError as e:
+                # Una subcarpeta ilegible no interrumpe la importación del resto
+                if directory == folder:
+                    self.progress_updated.emit(0, f"Error al explorar carpeta: {str(e)}")
+                    self.finished.emit([])
+                    return
+                print(f"No se pudo explorar {directory}: {e}")
 
-        # Ordenar archivos por nombre
-        image_files.sort()
+        if batch:
+            image_files.extend(self._emit_batch(batch))
+
+        # Orden natural para que IMG_9999 quede antes que IMG_10000
+        image_files.sort(key=natural_sort_key)
 
         # Emitir progreso final y lista de archivos
         self.progress_updated.emit(100, f"Carga completada: {len(image_files)} imágenes encontradas.")
         self.finished.emit(image_files)
+
+    def _emit_batch(self, batch):
+        batch.sort(key=natural_sort_key)
+        self.batch_found.emit(list(batch))
+        return batch
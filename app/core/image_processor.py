@@ -3,11 +3,65 @@ import cv2
 import numpy as np
 import rawpy
 
+from app.utils import config
+from app.utils.file_utils import is_raw_file
+from .frame_cache import DiskFrameCache, MemoryFrameCache
+
+
+def adjust_exposure_contrast(image, exposure=0, contrast=0):
+    """Ajusta exposición y contraste de un array de numpy (usable desde procesos trabajadores)."""
+    if image is None:
+        return None
+
+    # Se conserva la profundidad del fotograma (8 bits o 16 bits de un revelado "full16")
+    max_value = np.iinfo(image.dtype).max if image.dtype.kind == 'u' else 255
+    result = image.copy().astype(np.float32)
+
+    if exposure != 0:
+        result = np.clip(result * (2.0 ** exposure), 0, max_value)
+
+    if contrast != 0:
+        factor = (1.0 + contrast)
+        mean = np.mean(result, axis=(0, 1), keepdims=True)
+        result = np.clip((result - mean) * factor + mean, 0, max_value)
+
+    return result.astype(image.dtype if image.dtype.kind == 'u' else np.uint8)
+
+
+# Parámetros de revelado RAW: se usan en `raw.postprocess` y forman parte de la clave de la caché en disco
+RAW_DEVELOP_PARAMS = {
+    'use_camera_wb': True,
+    'no_auto_bright': True,
+    'output_color': rawpy.ColorSpace.sRGB,
+    'gamma': (2.4, 4.5),  # Slightly different gamma for better vibrancy
+    'output_bps': 8,
+}
+
+# Receta completa de revelado: primero la miniatura incrustada y, si no hay, postprocess
+RAW_DEVELOP_RECIPE = dict(RAW_DEVELOP_PARAMS, extract_thumb=True)
+
+# Revelado a 16 bits por canal (decode_mode "full16"), sin pasar por la miniatura de 8 bits
+RAW_DEVELOP_PARAMS_16 = dict(RAW_DEVELOP_PARAMS, output_bps=16)
+
+# Decodificación a escala reducida de OpenCV (el escalado se hace durante la decodificación JPEG)
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
 
 class ImageProcessor:
-    def __init__(self):
-        self.preview_cache = {}
-        self.MAX_CACHE_SIZE = 20
+    def __init__(self, cache_dir=config.CACHE_DIR, disk_cache_max_bytes=config.DISK_CACHE_MAX_BYTES,
+                 preview_cache_max_bytes=config.PREVIEW_CACHE_MAX_BYTES):
+        self.preview_cache = MemoryFrameCache(preview_cache_max_bytes)
+        self.disk_cache = None
+        if cache_dir:
+            try:
+                self.disk_cache = DiskFrameCache(cache_dir, disk_cache_max_bytes)
+            except OSError as e:
+                print(f"No se pudo crear la caché en disco en {cache_dir}: {e}")
 
     def is_in_cache(self, image_path):
         """Comprueba si una imagen ya está en el caché."""
@@ -17,60 +71,168 @@ class ImageProcessor:
         """Limpia el caché, útil al cargar una nueva secuencia."""
         self.preview_cache.clear()
 
-    def load_image(self, image_path, use_cache=True):
-        """Carga una imagen, soportando formatos RAW y JPEG, con opción de caché."""
-        if use_cache and image_path in self.preview_cache:
-            return self.preview_cache[image_path].copy()
+    def load_image(self, image_path, use_cache=True, readonly=False):
+        """Carga una imagen, soportando formatos RAW y JPEG, con opción de caché.
+
+        Con `readonly=True` los aciertos de caché devuelven una vista de solo lectura
+        en lugar de una copia completa.
+        """
+        if use_cache:
+            cached = self.preview_cache.get(image_path, copy=not readonly)
+            if cached is not None:
+                return cached
 
         try:
-            if image_path.lower().endswith(('.raw', '.cr2', '.nef', '.arw', '.raf')):
-                with rawpy.imread(image_path) as raw:
-                    # Use the same processing as thumbnails
-                    try:
-                        # Try to extract embedded thumbnail first (like thumbnails do)
-                        thumb = raw.extract_thumb()
-                        if thumb.format == rawpy.ThumbFormat.JPEG:
-                            image_data = np.frombuffer(thumb.data, np.uint8)
-                            image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
-                        else:
-                            raise rawpy.LibRawNoThumbnailError()
-                    except rawpy.LibRawNoThumbnailError:
-                        # Fall back to full development with matching parameters
-                        rgb = raw.postprocess(
-                            use_camera_wb=True,
-                            no_auto_bright=True,
-                            output_color=rawpy.ColorSpace.sRGB,
-                            gamma=(2.4, 4.5),  # Slightly different gamma for better vibrancy
-                            output_bps=8
-                        )
-                        image = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+            if is_raw_file(image_path):
+                image = None
+                if self.disk_cache is not None:
+                    image = self.disk_cache.get(image_path, RAW_DEVELOP_RECIPE)
+                if image is None:
+                    image, developed = self._develop_raw(image_path)
+                    # La miniatura incrustada se vuelve a decodificar en milisegundos: solo
+                    # se guardan en disco los revelados completos
+                    if self.disk_cache is not None and image is not None and developed:
+                        self.disk_cache.put(image_path, RAW_DEVELOP_RECIPE, image)
             else:
                 image = cv2.imread(image_path)
 
             if use_cache and image is not None:
-                if len(self.preview_cache) >= self.MAX_CACHE_SIZE:
-                    self.preview_cache.pop(next(iter(self.preview_cache)))
-                self.preview_cache[image_path] = image
-                return image.copy()
+                cached = self.preview_cache.put(image_path, image)
+                return cached if readonly else image.copy()
 
             return image
         except Exception as e:
             print(f"Error al cargar la imagen {image_path}: {e}")
             return None
 
-    def adjust_image_from_array(self, image, exposure=0, contrast=0):
-        """Ajusta exposición y contraste de una imagen desde un array de numpy."""
-        if image is None:
+    def load_image_16(self, image_path):
+        """Carga una imagen a 16 bits por canal, sin cachés de memoria.
+
+        Los RAW se revelan con `output_bps=16` (usando la caché en disco); los TIFF/PNG de 16
+        bits conservan su profundidad. Los formatos de 8 bits (JPEG) se devuelven tal cual.
+        """
+        try:
+            if not is_raw_file(image_path):
+                return cv2.imread(image_path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_COLOR)
+
+            image = None
+            if self.disk_cache is not None:
+                image = self.disk_cache.get(image_path, RAW_DEVELOP_PARAMS_16)
+            if image is None:
+                with rawpy.imread(image_path) as raw:
+                    image = cv2.cvtColor(raw.postprocess(**RAW_DEVELOP_PARAMS_16), cv2.COLOR_RGB2BGR)
+                if self.disk_cache is not None:
+                    self.disk_cache.put(image_path, RAW_DEVELOP_PARAMS_16, image)
+            return image
+        except Exception as e:
+            print(f"Error al cargar la imagen {image_path} a 16 bits: {e}")
+            return None
+
+    def load_analysis_image(self, image_path, reduction=config.ANALYSIS_REDUCTION):
+        """Carga una versión reducida de la imagen para análisis, sin pasar por resolución completa.
+
+        Los JPEG se decodifican directamente a 1/`reduction` de su tamaño. Los RAW usan la
+        miniatura incrustada (también decodificada a escala) o, si no hay, un revelado a
+        media resolución que se reduce después. No usa las cachés.
+        """
+        flag = REDUCED_DECODE_FLAGS.get(reduction, cv2.IMREAD_REDUCED_COLOR_8)
+        try:
+            if not is_raw_file(image_path):
+                return cv2.imread(image_path, flag)
+
+            with rawpy.imread(image_path) as raw:
+                try:
+                    thumb = raw.extract_thumb()
+                    if thumb.format == rawpy.ThumbFormat.JPEG:
+                        return cv2.imdecode(np.frombuffer(thumb.data, np.uint8), flag)
+                except rawpy.LibRawNoThumbnailError:
+                    pass
+
+                rgb = raw.postprocess(half_size=True, **RAW_DEVELOP_PARAMS)
+                image = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+                if reduction > 2:
+                    # half_size ya divide entre 2; completar el resto de la reducción
+                    scale = 2.0 / reduction
+                    image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                return image
+        except Exception as e:
+            print(f"Error al cargar la imagen de análisis {image_path}: {e}")
+            return None
+
+    def load_raw_luminance(self, image_path, step=config.BAYER_ANALYSIS_STEP):
+        """Luminancia lineal (0-1) de un RAW calculada sobre los datos del sensor, sin revelar.
+
+        Toma una de cada `step` celdas 2x2 del patrón Bayer, resta el nivel de negro de cada
+        canal, normaliza con el nivel de blanco y aplica el balance de blancos de la cámara.
+        Devuelve None si el archivo no es RAW o su sensor no usa un patrón Bayer 2x2
+        (p. ej. X-Trans); en ese caso se debe usar `load_analysis_image`.
+        """
+        if not is_raw_file(image_path):
+            return None
+        try:
+            with rawpy.imread(image_path) as raw:
+                if raw.raw_pattern is None or raw.raw_pattern.shape != (2, 2):
+                    return None
+
+                stride = 2 * max(1, int(step))
+                data = raw.raw_image_visible
+                colors = raw.raw_colors_visible
+                color_desc = raw.color_desc.decode("ascii")
+                black = np.asarray(raw.black_level_per_channel, dtype=np.float32)
+                white = float(raw.white_level)
+                wb = np.asarray(raw.camera_whitebalance, dtype=np.float32)
+                if wb[3] == 0:
+                    wb[3] = wb[1]
+                if not np.all(wb[:3] > 0):
+                    wb = np.ones(4, dtype=np.float32)
+
+                channels = {"R": [], "G": [], "B": []}
+                for dy in (0, 1):
+                    for dx in (0, 1):
+                        color = colors[dy, dx]
+                        samples = data[dy::stride, dx::stride].astype(np.float32)
+                        samples = (samples - black[color]) / (white - black[color]) * (wb[color] / wb[1])
+                        channels[color_desc[color]].append(samples)
+
+                if not all(channels.values()):
+                    return None
+
+                # Recortar al tamaño común (las celdas del borde pueden quedar incompletas)
+                planes = [p for plane_list in channels.values() for p in plane_list]
+                height = min(p.shape[0] for p in planes)
+                width = min(p.shape[1] for p in planes)
+                red, green, blue = (np.mean([p[:height, :width] for p in channels[c]], axis=0)
+                                    for c in ("R", "G", "B"))
+                luminance = 0.2126 * red + 0.7152 * green + 0.0722 * blue
+                return np.clip(luminance, 0, 1).astype(np.float32)
+        except Exception as e:
+            print(f"Error al leer los datos del sensor de {image_path}: {e}")
             return None
 
-        result = image.copy().astype(np.float32)
+    def develop_raw(self, image_path):
+        """Revela un archivo RAW con los mismos parámetros que las miniaturas."""
+        return self._develop_raw(image_path)[0]
 
-        if exposure != 0:
-            result = np.clip(result * (2.0 ** exposure), 0, 255)
+    def _develop_raw(self, image_path):
+        """Como develop_raw, indicando además si ha hecho falta un revelado completo"""
+        with rawpy.imread(image_path) as raw:
+            try:
+                # Try to extract embedded thumbnail first (like thumbnails do)
+                thumb = raw.extract_thumb()
+                if thumb.format == rawpy.ThumbFormat.JPEG:
+                    image_data = np.frombuffer(thumb.data, np.uint8)
+                    return cv2.imdecode(image_data, cv2.IMREAD_COLOR), False
+                else:
+                    raise rawpy.LibRawNoThumbnailError()
+            except rawpy.LibRawNoThumbnailError:
+                # Fall back to full development with matching parameters
+                rgb = raw.postprocess(**RAW_DEVELOP_PARAMS)
+                return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), True
 
-        if contrast != 0:
-            factor = (1.0 + contrast)
-            mean = np.mean(result, axis=(0, 1), keepdims=True)
-            result = np.clip((result - mean) * factor + mean, 0, 255)
+    def adjust_image(self, image_path, exposure=0, contrast=0, use_cache=True):
+        """Carga una imagen y ajusta su exposición y contraste."""
+        return self.adjust_image_from_array(self.load_image(image_path, use_cache=use_cache), exposure, contrast)
 
-        return result.astype(np.uint8)
+    def adjust_image_from_array(self, image, exposure=0, contrast=0):
+        """Ajusta exposición y contraste de una imagen desde un array de numpy."""
+        return adjust_exposure_contrast(image, exposure, contrast)
@@ -0,0 +1,184 @@
+# app/core/image_sequence_exporter.py
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .frame_source import ArrayFrameSource, FrameSource, PathFrameSource
+from .pipeline import BackgroundIterator, ordered_map
+from .video_exporter import ExportProgress
+
+SEQUENCE_FORMATS = {
+    'tiff': '.tif',
+    'png': '.png',
+    'jpeg': '.jpg',
+}
+
+TIFF_COMPRESSION = {
+    'none': 1,
+    'lzw': 5,
+    'deflate': 8,
+}
+
+DEFAULT_NAME_PATTERN = "frame_{index:06d}"
+
+
+def encode_parameters(image_format, compression=None, quality=95):
+    """Parámetros de cv2.imencode para el formato: compresión TIFF ('none', 'lzw', 'deflate'),
+    nivel PNG (0-9) o calidad JPEG (1-100)"""
+    if image_format == 'tiff':
+        compression = compression or 'lzw'
+        if compression not in TIFF_COMPRESSION:
+            raise ValueError(f"Compresión TIFF no válida: {compression}")
+        return [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSION[compression]]
+    if image_format == 'png':
+        try:
+            level = int(compression if compression is not None else 3)
+        except (TypeError, ValueError):
+            raise ValueError(f"Nivel de compresión PNG no válido: {compression} (0-9)")
+        return [cv2.IMWRITE_PNG_COMPRESSION, level]
+    if image_format == 'jpeg':
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    raise ValueError(f"Formato de secuencia no válido: {image_format}")
+
+
+def parse_resolution(resolution):
+    """Convierte "ANCHOxALTO" en (ancho, alto)"""
+    try:
+        width, height = map(int, resolution.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Resolución no válida: {resolution} (ANCHOxALTO)")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Resolución no válida: {resolution} (ANCHOxALTO)")
+    return width, height
+
+
+def convert_bit_depth(image, bit_depth):
+    """Convierte un fotograma a 8 o 16 bits por canal (None lo deja como está)"""
+    if bit_depth == 16 and image.dtype == np.uint8:
+        return image.astype(np.uint16) * 257
+    if bit_depth == 8 and image.dtype == np.uint16:
+        return (image >> 8).astype(np.uint8)
+    return image
+
+
+class ImageSequenceExporter:
+    """Exporta una secuencia como imágenes numeradas (TIFF, PNG o JPEG).
+
+    Los fotogramas se preparan igual que para vídeo (decodificación y corrección en procesos
+    trabajadores, en un hilo de fondo) y la codificación y escritura de cada archivo se
+    reparte en un pool de hilos: cv2.imencode y la escritura en disco liberan el GIL, así que
+    varios archivos se comprimen y escriben a la vez. Cada archivo se escribe primero como
+    `.part` y se renombra al terminar, de modo que nunca queda una imagen a medias con su
+    nombre definitivo.
+    """
+
+    def __init__(self, max_workers=None, max_queue=4):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Fotogramas preparados que pueden esperar a los hilos de escritura
+        self.max_queue = max_queue
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def export_sequence(self, image_sequence, output_dir, image_format='tiff', bit_depth=None, compression=None,
+                        quality=95, resolution=None, name_pattern=DEFAULT_NAME_PATTERN, start_number=1,
+                        progress_callback=None):
+        """Escribe la secuencia en `output_dir`.
+
+        `bit_depth` (8 o 16) convierte los fotogramas; por defecto se mantiene la profundidad de
+        origen (JPEG siempre usa 8 bits). Con 16 bits los RAW de una PathFrameSource se revelan
+        a 16 bits por canal y la corrección se hace a esa profundidad. `resolution` ("ANCHOxALTO") redimensiona; None conserva
+        el tamaño original. `name_pattern` se formatea con `index` (desde `start_number`) y `name`
+        (nombre del archivo de origen sin extensión, si la secuencia viene de archivos).
+        `progress_callback(stats)` recibe las mismas claves que en la exportación de vídeo.
+        Devuelve True si se han escrito todos los fotogramas.
+        """
+        self._cancel_event.clear()
+        if not image_sequence:
+            print("Secuencia de imágenes vacía")
+            return False
+        if image_format == 'jpeg':
+            bit_depth = 8
+        extension = SEQUENCE_FORMATS.get(image_format)
+        try:
+            params = encode_parameters(image_format, compression, quality)
+            size = parse_resolution(resolution) if resolution else None
+        except ValueError as e:
+            print(e)
+            return False
+
+        if not isinstance(image_sequence, FrameSource):
+            image_sequence = ArrayFrameSource(image_sequence)
+        if bit_depth == 16:
+            if isinstance(image_sequence, PathFrameSource) and image_sequence.decode_mode == "full":
+                image_sequence = image_sequence.with_decode_mode("full16")
+            else:
+                print("Los fotogramas ya están decodificados a 8 bits: la salida de 16 bits solo "
+                      "amplía la escala, sin más precisión")
+        if isinstance(image_sequence, PathFrameSource):
+            names = [os.path.splitext(os.path.basename(path))[0] for path in image_sequence.paths()]
+        else:
+            names = [str(i) for i in range(len(image_sequence))]
+        if size:
+            image_sequence = image_sequence.resize(*size)
+
+        try:
+            file_names = [name_pattern.format(index=start_number + i, name=name) + extension
+                          for i, name in enumerate(names)]
+        except (KeyError, IndexError, ValueError) as e:
+            print(f"Patrón de nombre no válido '{name_pattern}': {e}")
+            return False
+        if len(set(file_names)) != len(file_names):
+            print(f"El patrón de nombre '{name_pattern}' genera nombres repetidos")
+            return False
+
+        os.makedirs(output_dir, exist_ok=True)
+        total = len(image_sequence)
+        frames = BackgroundIterator(image_sequence, self.max_queue)
+        progress = ExportProgress(progress_callback, total, frames, self.max_queue)
+        start_time = time.monotonic()
+
+        def write_frame(item):
+            index, image = item
+            if image is None or self._cancel_event.is_set():
+                return False
+            path = os.path.join(output_dir, file_names[index])
+            temp_path = os.path.join(output_dir, f".{file_names[index]}.part")
+            try:
+                ok, data = cv2.imencode(extension, convert_bit_depth(image, bit_depth), params)
+                if not ok:
+                    raise ValueError("cv2.imencode no pudo codificar el fotograma")
+                with open(temp_path, "wb") as f:
+                    f.write(memoryview(data).cast('B'))
+                os.replace(temp_path, path)
+                return True
+            except Exception as e:
+                print(f"Error al escribir {path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return False
+
+        written = 0
+        try:
+            for i, result in enumerate(ordered_map(write_frame, enumerate(frames), self.max_workers)):
+                if self._cancel_event.is_set():
+                    print("Exportación cancelada")
+                    return False
+                if not result:
+                    print(f"Frame {i} no se pudo exportar")
+                    continue
+                written += 1
+                elapsed = time.monotonic() - start_time
+                progress.update({"frame": written, "fps": round(written / elapsed, 2) if elapsed > 0 else None})
+        except Exception as e:
+            print(f"Error al exportar la secuencia: {e}")
+            return False
+        finally:
+            frames.close()
+
+        progress.update({"frame": written, "finished": True})
+        return written == total
@@ -0,0 +1,138 @@
+# app/core/parallel_decoder.py
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils import config
+from .image_processor import ImageProcessor
+
+# Procesador propio de cada proceso trabajador (se crea una sola vez por proceso)
+_worker_processor = None
+_worker_cache_dir = config.CACHE_DIR
+
+
+def _init_worker(cache_dir):
+    global _worker_cache_dir
+    _worker_cache_dir = cache_dir
+
+
+def _get_worker_processor():
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = ImageProcessor(cache_dir=_worker_cache_dir)
+    return _worker_processor
+
+
+def _decode_task(image_path, transform, transform_args, decode_mode, processor=None,
+                 reduction=config.ANALYSIS_REDUCTION):
+    """Decodifica una imagen en el proceso trabajador y aplica la transformación opcional"""
+    processor = processor or _get_worker_processor()
+    if decode_mode == "analysis":
+        image = processor.load_analysis_image(image_path, reduction)
+    elif decode_mode == "bayer":
+        # Luminancia lineal directamente del sensor; los no RAW usan la decodificación reducida
+        image = processor.load_raw_luminance(image_path)
+        if image is None:
+            image = processor.load_analysis_image(image_path, reduction)
+    elif decode_mode == "full16":
+        image = processor.load_image_16(image_path)
+    else:
+        image = processor.load_image(image_path, use_cache=False)
+    if transform is None:
+        return image
+    return transform(image, *transform_args)
+
+
+class ParallelDecoder:
+    """Decodifica secuencias de imágenes en varios procesos entregando los resultados en orden.
+
+    Mantiene como máximo `max_in_flight` imágenes pendientes para acotar la memoria
+    y permite cancelar la decodificación desde otro hilo con `cancel()`.
+    """
+
+    def __init__(self, max_workers=None, max_in_flight=None, cache_dir=config.CACHE_DIR):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.max_workers * 2
+        self.cache_dir = cache_dir
+        self._executor = None
+        self._cancel_event = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # "spawn" evita heredar el estado de Qt del proceso principal
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                                 initializer=_init_worker, initargs=(self.cache_dir,))
+        return self._executor
+
+    def cancel(self):
+        """Solicita la cancelación de la decodificación en curso"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def imap(self, image_paths, transform=None, transform_args=None, decode_mode="full",
+             reduction=config.ANALYSIS_REDUCTION):
+        """Genera las imágenes decodificadas en el mismo orden que `image_paths`.
+
+        `transform` debe ser una función de nivel de módulo (serializable) que recibe la
+        imagen y los argumentos de `transform_args[i]`; se ejecuta en el proceso trabajador
+        para no devolver imágenes completas cuando solo interesa un resultado derivado.
+        Con `decode_mode="analysis"` se usa la decodificación reducida a 1/`reduction` y con
+        `decode_mode="bayer"` la luminancia lineal de los datos del sensor (solo RAW);
+        `decode_mode="full16"` revela a 16 bits por canal.
+        Las imágenes que no se pueden cargar se entregan como None.
+        """
+        self._cancel_event.clear()
+
+        def args_for(index):
+            if transform_args is None:
+                return ()
+            return tuple(transform_args[index])
+
+        if self.max_workers <= 1:
+            # Sin procesos auxiliares: decodificar en el propio hilo
+            processor = ImageProcessor(cache_dir=self.cache_dir)
+            for i, image_path in enumerate(image_paths):
+                if self._cancel_event.is_set():
+                    return
+                yield _decode_task(image_path, transform, args_for(i), decode_mode, processor, reduction)
+            return
+
+        executor = self._get_executor()
+        pending = deque()
+        paths = iter(enumerate(image_paths))
+
+        try:
+            for i, image_path in paths:
+                pending.append(executor.submit(_decode_task, image_path, transform, args_for(i), decode_mode,
+                                               None, reduction))
+                if len(pending) < self.max_in_flight:
+                    continue
+
+                if self._cancel_event.is_set():
+                    return
+                yield pending.popleft().result()
+
+            while pending:
+                if self._cancel_event.is_set():
+                    return
+                yield pending.popleft().result()
+        finally:
+            # Descartar el trabajo que aún no ha empezado (cancelación o salida anticipada)
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
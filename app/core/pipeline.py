@@ -0,0 +1,131 @@
+# app/core/pipeline.py
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _ProducerError:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+_DONE = object()
+
+
+def ordered_map(func, items, max_workers=None, max_in_flight=None):
+    """Aplica `func` a cada elemento en un pool de hilos y entrega los resultados en orden.
+
+    Pensado para trabajo que libera el GIL (OpenCV, NumPy). Como mucho hay
+    `max_in_flight` resultados pendientes, así que la memoria no depende de la longitud.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    if max_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ordered-map")
+    pending = collections.deque()
+    try:
+        for item in items:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BackgroundIterator:
+    """Consume un iterable en un hilo de fondo y entrega sus elementos en orden.
+
+    La cola intermedia está acotada a `max_queue` elementos: si el consumidor (p. ej. el
+    codificador) va más lento, el productor (decodificación y corrección) se detiene en
+    lugar de acumular fotogramas en memoria. Las excepciones del productor se relanzan
+    en el consumidor. `close()` detiene el productor y cancela el iterable si lo permite.
+    """
+
+    def __init__(self, iterable, max_queue=4):
+        self.iterable = iterable
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._stop_event = threading.Event()
+        self._finished = False
+        self.produced = 0
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._produce, name="pipeline-producer", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        """Encola un elemento esperando mientras la cola esté llena; False si se ha cerrado"""
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        iterator = iter(self.iterable)
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    break
+                self.produced += 1
+        except Exception as e:
+            self._put(_ProducerError(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            self._put(_DONE)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        item = self._queue.get()
+        if item is _DONE:
+            self._finished = True
+            raise StopIteration
+        if isinstance(item, _ProducerError):
+            self._finished = True
+            raise item.exception
+        return item
+
+    def queue_depth(self):
+        """Elementos producidos que esperan al consumidor"""
+        return self._queue.qsize()
+
+    def producer_fps(self):
+        """Elementos por segundo generados por el productor desde el inicio"""
+        elapsed = time.monotonic() - self._start_time
+        return self.produced / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        """Detiene el productor y descarta los elementos pendientes"""
+        self._finished = True
+        self._stop_event.set()
+        cancel = getattr(self.iterable, "cancel", None)
+        if cancel is not None:
+            cancel()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,102 @@
+# app/core/prefetcher.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FramePrefetcher:
+    """Precarga en segundo plano los fotogramas vecinos en la caché de un ImageProcessor.
+
+    La cantidad de fotogramas precargados depende de la dirección y la velocidad de
+    navegación; al saltar a otra posición se cancela el trabajo pendiente que ya no sirve.
+    """
+
+    def __init__(self, processor, max_workers=2, min_ahead=2, max_ahead=12, behind=1, lookahead_seconds=1.0):
+        self.processor = processor
+        self.min_ahead = min_ahead
+        self.max_ahead = max_ahead
+        self.behind = behind
+        self.lookahead_seconds = lookahead_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._last_index = None
+        self._last_time = None
+        self._direction = 1
+        self._frame_bytes = 0
+
+    def _load(self, image_path):
+        image = self.processor.load_image(image_path, use_cache=True, readonly=True)
+        if image is not None:
+            self._frame_bytes = image.nbytes
+        return image
+
+    def load(self, image_path):
+        """Devuelve el fotograma, esperando a la precarga si ya está en curso"""
+        with self._lock:
+            future = self._futures.get(image_path)
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except Exception as e:
+                print(f"Error en la precarga de {image_path}: {e}")
+        return self._load(image_path)
+
+    def _frames_ahead(self, interval):
+        """Número de fotogramas a precargar según la velocidad de navegación"""
+        ahead = self.min_ahead
+        if interval:
+            speed = 1.0 / interval  # fotogramas por segundo
+            ahead = max(ahead, int(round(speed * self.lookahead_seconds)))
+        ahead = min(ahead, self.max_ahead)
+
+        # No precargar más de lo que cabe en la caché de previsualización
+        if self._frame_bytes:
+            capacity = int(self.processor.preview_cache.max_bytes // self._frame_bytes) - self.behind - 1
+            ahead = max(0, min(ahead, capacity))
+        return ahead
+
+    def navigate(self, image_sequence, index, jump=False):
+        """Informa de la posición actual y programa la precarga de los vecinos"""
+        now = time.monotonic()
+        interval = None
+        if self._last_index is not None and not jump:
+            step = index - self._last_index
+            if abs(step) == 1:
+                self._direction = step
+                interval = now - self._last_time
+            else:
+                jump = True
+        self._last_index = index
+        self._last_time = now
+
+        ahead = self._frames_ahead(None if jump else interval)
+        targets = [index + self._direction * k for k in range(1, ahead + 1)]
+        targets += [index - self._direction * k for k in range(1, self.behind + 1)]
+        target_paths = [image_sequence[i] for i in targets if 0 <= i < len(image_sequence)]
+
+        with self._lock:
+            # Cancelar la precarga que aún no ha empezado y ya no está cerca de la posición actual
+            wanted = set(target_paths) | {image_sequence[index]}
+            for path, future in list(self._futures.items()):
+                if future.done() or (path not in wanted and future.cancel()):
+                    del self._futures[path]
+
+            for path in target_paths:
+                if path not in self._futures and not self.processor.is_in_cache(path):
+                    self._futures[path] = self._executor.submit(self._load, path)
+
+    def reset(self):
+        """Cancela toda la precarga pendiente (p. ej. al importar otra secuencia)"""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self._last_index = None
+        self._last_time = None
+        self._direction = 1
+        self._frame_bytes = 0
+
+    def shutdown(self):
+        self.reset()
+        self._executor.shutdown(wait=False, cancel_futures=True)
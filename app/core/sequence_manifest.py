@@ -0,0 +1,171 @@
+# app/core/sequence_manifest.py
+import hashlib
+import json
+import os
+
+from app.utils import config
+
+try:
+    import pyexiv2
+    HAS_PYEXIV2 = True
+except ImportError:
+    HAS_PYEXIV2 = False
+    print("Advertencia: pyexiv2 no está instalado. El índice de secuencia no incluirá datos EXIF.")
+
+MANIFEST_NAME = ".lapsefy_index.json"
+MANIFEST_VERSION = 1
+
+# Campos EXIF que se guardan en el índice
+EXIF_FIELDS = (
+    'Exif.Photo.ExposureTime',
+    'Exif.Photo.FNumber',
+    'Exif.Photo.ISOSpeedRatings',
+    'Exif.Photo.DateTimeOriginal',
+    'Exif.Photo.FocalLength',
+    'Exif.Image.Make',
+    'Exif.Image.Model',
+)
+
+# Posición de la miniatura incrustada (JPEG) según el tipo de archivo
+THUMBNAIL_FIELDS = (
+    ('Exif.Thumbnail.JPEGInterchangeFormat', 'Exif.Thumbnail.JPEGInterchangeFormatLength'),
+    ('Exif.Image.JPEGInterchangeFormat', 'Exif.Image.JPEGInterchangeFormatLength'),
+    ('Exif.Image2.JPEGInterchangeFormat', 'Exif.Image2.JPEGInterchangeFormatLength'),
+)
+
+
+def read_frame_metadata(image_path):
+    """Lee EXIF, dimensiones y posición de la miniatura de un fotograma con pyexiv2"""
+    metadata = {"exif": {}, "width": None, "height": None, "thumbnail": None}
+    if not HAS_PYEXIV2:
+        return metadata
+
+    try:
+        image = pyexiv2.Image(image_path)
+    except Exception as e:
+        print(f"Error al leer metadatos de {image_path}: {e}")
+        return metadata
+
+    try:
+        exif = image.read_exif()
+        metadata["exif"] = {key: exif[key] for key in EXIF_FIELDS if key in exif}
+        metadata["width"] = image.get_pixel_width()
+        metadata["height"] = image.get_pixel_height()
+
+        for offset_key, length_key in THUMBNAIL_FIELDS:
+            if offset_key in exif and length_key in exif:
+                metadata["thumbnail"] = {"offset": int(exif[offset_key]), "length": int(exif[length_key])}
+                break
+    except Exception as e:
+        print(f"Error al leer metadatos de {image_path}: {e}")
+    finally:
+        image.close()
+
+    return metadata
+
+
+class SequenceManifest:
+    """Índice de una secuencia guardado junto a las imágenes.
+
+    Por cada fotograma guarda tamaño, fecha de modificación, EXIF, dimensiones, posición
+    de la miniatura y valores de brillo. Al reabrir la secuencia solo se vuelven a leer
+    los archivos cuyo tamaño o fecha han cambiado.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.base_dir = os.path.dirname(path)
+        self.frames = {}
+        self.dirty = False
+
+    @classmethod
+    def for_sequence(cls, image_sequence):
+        """Crea el índice en la carpeta común de la secuencia (o en la caché si no se puede escribir)"""
+        base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in image_sequence])
+        if not os.access(base_dir, os.W_OK):
+            digest = hashlib.sha1(base_dir.encode("utf-8")).hexdigest()
+            index_dir = os.path.join(os.path.dirname(config.CACHE_DIR), "indexes")
+            os.makedirs(index_dir, exist_ok=True)
+            manifest = cls(os.path.join(index_dir, f"{digest}.json"))
+            manifest.base_dir = base_dir
+            return manifest
+        return cls(os.path.join(base_dir, MANIFEST_NAME))
+
+    def _key(self, image_path):
+        return os.path.relpath(os.path.abspath(image_path), self.base_dir)
+
+    def load(self):
+        """Carga el índice del disco si existe y es de una versión compatible"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Índice de secuencia no válido ({self.path}): {e}")
+            return False
+
+        if data.get("version") != MANIFEST_VERSION:
+            return False
+        self.frames = data.get("frames", {})
+        self.dirty = False
+        return True
+
+    def save(self):
+        """Guarda el índice de forma atómica"""
+        data = {"version": MANIFEST_VERSION, "frames": self.frames}
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"No se pudo guardar el índice de secuencia: {e}")
+
+    def refresh(self, image_sequence, file_stats=None):
+        """Valida el índice contra los archivos y relee solo los que han cambiado.
+
+        `file_stats` puede traer (tamaño, mtime_ns) ya obtenidos al explorar la carpeta.
+        Devuelve la lista de rutas que se han tenido que volver a leer.
+        """
+        file_stats = file_stats or {}
+        frames = {}
+        changed = []
+
+        for image_path in image_sequence:
+            key = self._key(image_path)
+            stats = file_stats.get(image_path)
+            if stats is None:
+                try:
+                    stat = os.stat(image_path)
+                except OSError:
+                    continue
+                stats = (stat.st_size, stat.st_mtime_ns)
+
+            entry = self.frames.get(key)
+            if entry is None or (entry["size"], entry["mtime_ns"]) != tuple(stats):
+                entry = {"size": stats[0], "mtime_ns": stats[1], "brightness": {}}
+                entry.update(read_frame_metadata(image_path))
+                changed.append(image_path)
+            frames[key] = entry
+
+        if changed or len(frames) != len(self.frames):
+            self.dirty = True
+        self.frames = frames
+        return changed
+
+    def get(self, image_path):
+        return self.frames.get(self._key(image_path))
+
+    def get_brightness(self, image_path, method):
+        entry = self.get(image_path)
+        if entry is None:
+            return None
+        return entry["brightness"].get(method)
+
+    def set_brightness(self, image_path, method, value):
+        entry = self.get(image_path)
+        if entry is not None and entry["brightness"].get(method) != value:
+            entry["brightness"][method] = value
+            self.dirty = True
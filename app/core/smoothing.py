@@ -0,0 +1,149 @@
+# app/core/smoothing.py
+"""Métodos de suavizado de la curva de brillo, compartidos por Deflickerer y DeflickerDialog.
+
+Todos los métodos son vectorizados (O(n) o O(n log n)) para poder re-suavizar curvas
+muy largas en cada movimiento del slider.
+"""
+import numpy as np
+from scipy import signal
+
+try:
+    import pywt
+    HAS_PYWT = True
+except ImportError:
+    HAS_PYWT = False
+    print("Advertencia: PyWavelets no está instalado. El suavizado wavelet no estará disponible.")
+
+METHODS = ("moving_average", "gaussian", "savitzky_golay", "wavelet", "loess")
+
+
+def _odd_window(window_size):
+    window_size = max(1, int(window_size))
+    return window_size + 1 if window_size % 2 == 0 else window_size
+
+
+def moving_average(data, window_size):
+    """Media móvil centrada con sumas acumuladas; en los bordes se promedia la ventana disponible"""
+    data = np.asarray(data, dtype=np.float64)
+    n = len(data)
+    if n == 0:
+        return data
+
+    half_window = _odd_window(window_size) // 2
+    cumulative = np.concatenate(([0.0], np.cumsum(data)))
+    positions = np.arange(n)
+    start = np.maximum(0, positions - half_window)
+    end = np.minimum(n, positions + half_window + 1)
+    return (cumulative[end] - cumulative[start]) / (end - start)
+
+
+def gaussian(data, window_size, sigma):
+    """Filtro gaussiano normalizado en los bordes (sin oscurecer los extremos de la curva)"""
+    data = np.asarray(data, dtype=np.float64)
+    if len(data) == 0:
+        return data
+
+    half_window = _odd_window(window_size) // 2
+    x = np.arange(-half_window, half_window + 1)
+    kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
+
+    # Convolución normalizada: en los bordes solo cuentan los pesos dentro de la curva.
+    # `signal.convolve` elige entre convolución directa y FFT según el tamaño.
+    smoothed = signal.convolve(data, kernel, mode='same')
+    weights = signal.convolve(np.ones_like(data), kernel, mode='same')
+    return smoothed / weights
+
+
+def savitzky_golay(data, window_size, order):
+    """Filtro Savitzky-Golay (preserva mejor los picos)"""
+    data = np.asarray(data, dtype=np.float64)
+    window_size = _odd_window(window_size)
+    if len(data) < window_size:
+        return data
+
+    return signal.savgol_filter(data, window_size, min(order, window_size - 1))
+
+
+def wavelet(data, sigma):
+    """Suavizado por umbralizado de coeficientes wavelet"""
+    data = np.asarray(data, dtype=np.float64)
+    if not HAS_PYWT:
+        print("Advertencia: pywt no instalado. Usando media móvil como alternativa.")
+        return moving_average(data, 21)
+
+    try:
+        # Descomposición wavelet
+        coeffs = pywt.wavedec(data, 'db4', level=4)
+        # Umbralizado de coeficientes
+        coeffs[1:] = [pywt.threshold(c, sigma * np.std(c), 'soft') for c in coeffs[1:]]
+        # Reconstrucción
+        smoothed = pywt.waverec(coeffs, 'db4')
+        # Ajustar longitud si es necesario
+        if len(smoothed) > len(data):
+            smoothed = smoothed[:len(data)]
+        elif len(smoothed) < len(data):
+            smoothed = np.pad(smoothed, (0, len(data) - len(smoothed)), 'edge')
+
+        return smoothed
+    except Exception as e:
+        print(f"Error en suavizado wavelet: {e}")
+        return moving_average(data, 21)
+
+
+def _tricube(distance, radius):
+    return (1 - np.clip(distance / radius, 0, 1) ** 3) ** 3
+
+
+def loess(data, window_size):
+    """Suavizado LOESS (regresión lineal local con pesos tricúbicos)
+
+    Con fotogramas equiespaciados, en el interior de la curva la regresión local es una
+    media ponderada simétrica y se calcula con una sola convolución; solo los bordes, donde
+    la ventana es asimétrica, necesitan el ajuste lineal completo.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    n = len(data)
+    window_size = min(_odd_window(window_size), n if n % 2 else n - 1)
+    if n < 3 or window_size < 3:
+        return data
+
+    half_window = window_size // 2
+    offsets = np.arange(-half_window, half_window + 1)
+    kernel = _tricube(np.abs(offsets), half_window + 1)
+    smoothed = signal.convolve(data, kernel / kernel.sum(), mode='same')
+
+    # Bordes: ventana de los `window_size` fotogramas más cercanos y ajuste lineal ponderado
+    x = np.arange(window_size, dtype=np.float64)
+    for positions, segment in ((np.arange(half_window), data[:window_size]),
+                               (np.arange(window_size - half_window, window_size), data[n - window_size:])):
+        distance = np.abs(x[None, :] - positions[:, None])
+        weights = _tricube(distance, distance.max(axis=1, keepdims=True) + 1)
+        sw = weights.sum(axis=1)
+        sx = weights @ x
+        sy = weights @ segment
+        sxx = weights @ (x * x)
+        sxy = weights @ (x * segment)
+        slope = (sw * sxy - sx * sy) / (sw * sxx - sx * sx)
+        intercept = (sy - slope * sx) / sw
+        values = intercept + slope * positions
+        if positions[0] == 0:
+            smoothed[:half_window] = values
+        else:
+            smoothed[n - half_window:] = values
+
+    return smoothed
+
+
+def smooth(data, method, window_size=21, sigma=2.0, order=3):
+    """Suaviza la curva con el método indicado; un método desconocido devuelve la curva sin cambios"""
+    if method == "moving_average":
+        return moving_average(data, window_size)
+    elif method == "gaussian":
+        return gaussian(data, window_size, sigma)
+    elif method == "savitzky_golay":
+        return savitzky_golay(data, window_size, order)
+    elif method == "wavelet":
+        return wavelet(data, sigma)
+    elif method == "loess":
+        return loess(data, window_size)
+    return np.asarray(data, dtype=np.float64)
@@ -1,113 +1,799 @@
 # app/core/video_exporter.py (modificaciones)
-import cv2
-import subprocess
+import collections
 import os
-import tempfile
+import queue
 import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import cv2
 import numpy as np
 
+from app.utils import config
+from .export_checkpoint import SegmentCheckpoint, settings_hash, source_fingerprint
+from .frame_source import ArrayFrameSource, FrameSource, PathFrameSource, resize_frame
+from .image_processor import REDUCED_DECODE_FLAGS, ImageProcessor
+from .sequence_manifest import HAS_PYEXIV2
+from .pipeline import BackgroundIterator
+
+if HAS_PYEXIV2:
+    import pyexiv2
+
+# Formatos que FFmpeg puede leer directamente igual que OpenCV (exportación sin decodificar)
+PASSTHROUGH_EXTENSIONS = ('.jpg', '.jpeg')
+
+# Tamaño máximo de tubería que se intenta pedir al sistema (Linux: /proc/sys/fs/pipe-max-size)
+PIPE_MAX_SIZE = 1024 * 1024
+
+CODEC_OPTIONS = {
+    'libx264': {
+        'codec': 'libx264',
+        'pix_fmt': 'yuv420p',
+        'crf': '23'
+    },
+    'libx265': {
+        'codec': 'libx265',
+        'pix_fmt': 'yuv420p',
+        'crf': '28'
+    },
+    'mpeg4': {
+        'codec': 'mpeg4',
+        'pix_fmt': 'yuv420p',
+        'qscale': '5'
+    },
+    'prores': {
+        'codec': 'prores_ks',
+        'pix_fmt': 'yuv422p10le',
+        'profile': '3'
+    },
+    # Borrador de revisión: prioriza la velocidad de codificación sobre el tamaño
+    'draft': {
+        'codec': 'libx264',
+        'pix_fmt': 'yuv420p',
+        'preset': 'ultrafast',
+        'crf': '30'
+    }
+}
+
+
+def _pipe_size():
+    """Tamaño de tubería a solicitar, limitado por el máximo que permite el sistema"""
+    try:
+        with open('/proc/sys/fs/pipe-max-size') as f:
+            return min(PIPE_MAX_SIZE, int(f.read()))
+    except (OSError, ValueError):
+        return -1
+
+
+def raw_pixel_format(frame):
+    """Formato rawvideo de FFmpeg para un fotograma BGR de 8 o 16 bits"""
+    return 'bgr48le' if frame.dtype == np.uint16 else 'bgr24'
+
+
+def codec_arguments(codec):
+    """Argumentos de FFmpeg del codec de salida y su calidad"""
+    options = CODEC_OPTIONS.get(codec, CODEC_OPTIONS['libx264'])
+    args = ['-c:v', options['codec'], '-pix_fmt', options['pix_fmt']]
+    if options.get('preset'):
+        args.extend(['-preset', options['preset']])
+
+    # Añadir opciones de calidad según el codec
+    if options.get('crf'):
+        args.extend(['-crf', options['crf']])
+    elif options.get('qscale'):
+        args.extend(['-qscale:v', options['qscale']])
+    elif options.get('profile'):
+        args.extend(['-profile:v', options['profile']])
+    return args
+
+
+def _has_default_orientation(image_path):
+    """OpenCV aplica la orientación EXIF al decodificar y FFmpeg no: solo es seguro pasar
+    directamente los archivos sin rotación"""
+    if not HAS_PYEXIV2:
+        return True
+    try:
+        image = pyexiv2.Image(image_path)
+        try:
+            orientation = image.read_exif().get('Exif.Image.Orientation', '1')
+        finally:
+            image.close()
+        return str(orientation).strip() in ('', '1')
+    except Exception:
+        return False
+
+
+def passthrough_paths(image_sequence):
+    """Rutas a pasar directamente a FFmpeg si la secuencia no necesita ningún procesado.
+
+    Solo aplica a un PathFrameSource sin transformaciones cuyos archivos son todos JPEG
+    sin rotación EXIF; en otro caso devuelve None.
+    """
+    if not isinstance(image_sequence, PathFrameSource) or image_sequence.transforms:
+        return None
+    if image_sequence.decode_mode != "full":
+        return None
+    paths = image_sequence.paths()
+    if not paths or not all(path.lower().endswith(PASSTHROUGH_EXTENSIONS) for path in paths):
+        return None
+    # Las secuencias salen de la misma cámara: basta con comprobar los extremos
+    if not all(_has_default_orientation(path) for path in {paths[0], paths[-1]}):
+        return None
+    return paths
+
+
+def draft_reduction(image_path, width, height):
+    """Mayor reducción de decodificación que no deja el fotograma por debajo de `width`x`height`.
+
+    El tamaño original se estima con la decodificación más reducida (1/8), que es casi
+    gratuita incluso para un RAW con miniatura.
+    """
+    image = ImageProcessor(cache_dir=None).load_analysis_image(image_path, max(REDUCED_DECODE_FLAGS))
+    if image is None:
+        return 1
+    full_height, full_width = (side * max(REDUCED_DECODE_FLAGS) for side in image.shape[:2])
+    return max(reduction for reduction in REDUCED_DECODE_FLAGS
+               if reduction == 1 or (full_width / reduction >= width and full_height / reduction >= height))
+
+
+def write_concat_list(paths, list_file):
+    """Lista de archivos para el demuxer concat de FFmpeg"""
+    for path in paths:
+        escaped = os.path.abspath(path).replace("'", "'\\''")
+        list_file.write(f"file '{escaped}'\n")
+
+
+def _parse_progress_value(key, value):
+    """Convierte un valor de `-progress` de FFmpeg ('31.5', '2048.3kbits/s', '1.2x', 'N/A')"""
+    value = value.strip()
+    if value in ('', 'N/A'):
+        return None
+    try:
+        if key in ('frame', 'total_size', 'out_time_us', 'out_time_ms', 'dup_frames', 'drop_frames'):
+            return int(value)
+        if key in ('fps', 'bitrate', 'speed'):
+            return float(value.replace('kbits/s', '').replace('x', ''))
+    except ValueError:
+        return None
+    return value
+
+
+def read_progress(stream, handler):
+    """Lee los bloques `clave=valor` de `-progress pipe:1` y llama a `handler(dict)` por bloque"""
+    block = {}
+    for line in iter(stream.readline, b''):
+        key, _, value = line.decode(errors='replace').partition('=')
+        key = key.strip()
+        if not key:
+            continue
+        if key == 'progress':
+            block['finished'] = value.strip() == 'end'
+            handler(block)
+            block = {}
+        else:
+            block[key] = _parse_progress_value(key, value)
+
+
+def progress_arguments():
+    """Argumentos para que FFmpeg informe del progreso por stdout"""
+    return ['-progress', 'pipe:1', '-nostats']
+
+
+class ExportProgress:
+    """Combina el progreso del codificador (FFmpeg) con el del productor de fotogramas.
+
+    Llama a `callback(stats)` con un diccionario: `frame` (fotogramas codificados),
+    `total`, `progress` (0-100), `fps`, `bitrate` (kbit/s), `speed`, `eta` (segundos),
+    `queue_depth`, `queue_size` y `producer_fps`. Si la cola está casi siempre llena el
+    cuello de botella es el codificador; si está vacía, la preparación de fotogramas.
+    """
+
+    def __init__(self, callback, total, producer=None, queue_size=None):
+        self.callback = callback
+        self.total = total
+        self.producer = producer
+        self.queue_size = queue_size
+        self.stats = {"frame": 0, "total": total, "progress": 0, "fps": None, "bitrate": None,
+                      "speed": None, "eta": None, "queue_depth": None, "queue_size": queue_size,
+                      "producer_fps": None}
+        self._start_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, encoder_stats):
+        if self.callback is None:
+            return
+        with self._lock:
+            stats = self.stats
+            frame = encoder_stats.get('frame')
+            if frame is not None:
+                stats["frame"] = frame
+            for key in ("fps", "bitrate", "speed"):
+                if encoder_stats.get(key) is not None:
+                    stats[key] = encoder_stats[key]
+            if self.total:
+                stats["progress"] = min(100, int(stats["frame"] / self.total * 100))
+            if encoder_stats.get('finished'):
+                stats["progress"] = 100
+
+            # ETA según el ritmo medio desde el inicio (más estable que el fps instantáneo)
+            elapsed = time.monotonic() - self._start_time
+            if stats["frame"] and elapsed > 0:
+                stats["eta"] = round(max(0, self.total - stats["frame"]) * elapsed / stats["frame"], 1)
+
+            if self.producer is not None:
+                stats["queue_depth"] = self.producer.queue_depth()
+                stats["producer_fps"] = round(self.producer.producer_fps(), 2)
+            snapshot = dict(stats)
+        self.callback(snapshot)
+
+
+class SegmentedProgress:
+    """Agrega el progreso de varios segmentos codificados a la vez.
+
+    Además de los totales (mismas claves que ExportProgress, sumando fps y colas y con la
+    ETA del segmento más lento), incluye `segments`: la lista del progreso de cada uno.
+    """
+
+    def __init__(self, callback, totals):
+        self.callback = callback
+        self.totals = totals
+        self.segment_stats = [None] * len(totals)
+        self._lock = threading.Lock()
+
+    def update(self, index, stats):
+        if self.callback is None:
+            return
+        with self._lock:
+            self.segment_stats[index] = stats
+            current = [s for s in self.segment_stats if s is not None]
+            total = sum(self.totals)
+            frame = sum(s["frame"] for s in current)
+
+            def total_of(key):
+                values = [s[key] for s in current if s.get(key) is not None]
+                return round(sum(values), 2) if values else None
+
+            etas = [s["eta"] for s in current if s.get("eta") is not None]
+            snapshot = {
+                "frame": frame,
+                "total": total,
+                "progress": min(100, int(frame / total * 100)) if total else 0,
+                "fps": total_of("fps"),
+                "bitrate": total_of("bitrate"),
+                "speed": total_of("speed"),
+                "eta": max(etas) if etas else None,
+                "queue_depth": total_of("queue_depth"),
+                "queue_size": total_of("queue_size"),
+                "producer_fps": total_of("producer_fps"),
+                "segments": [
+                    {"index": i, "frame": s["frame"] if s else 0, "total": t,
+                     "progress": s["progress"] if s else 0, "fps": s["fps"] if s else None}
+                    for i, (s, t) in enumerate(zip(self.segment_stats, self.totals))
+                ],
+            }
+        self.callback(snapshot)
+
+
+def segment_ranges(total, segments, gop_size):
+    """Divide [0, total) en como mucho `segments` tramos que empiezan en múltiplos de `gop_size`"""
+    gops = -(-total // gop_size)
+    segments = max(1, min(segments, gops))
+    boundaries = [min(total, round(k * gops / segments) * gop_size) for k in range(segments + 1)]
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+class FFmpegWriter:
+    """Proceso FFmpeg persistente que recibe fotogramas sin comprimir por stdin.
+
+    El primer fotograma fija tamaño y formato (bgr24 o bgr48le); los siguientes con otro
+    tamaño se redimensionan. La salida de error se lee en un hilo para que FFmpeg nunca
+    se bloquee escribiendo en ella.
+    """
+
+    def __init__(self, output_path, fps, output_args, stderr_lines=50, progress_handler=None):
+        self.output_path = output_path
+        self.fps = fps
+        self.output_args = list(output_args)
+        self.progress_handler = progress_handler
+        self._progress_thread = None
+        self.process = None
+        self.frame_size = None
+        self.pixel_format = None
+        self.frames_written = 0
+        self._stderr = collections.deque(maxlen=stderr_lines)
+        self._stderr_thread = None
+
+    def _start(self, frame):
+        height, width = frame.shape[:2]
+        self.frame_size = (width, height)
+        self.pixel_format = raw_pixel_format(frame)
+        cmd = [
+            'ffmpeg',
+            '-hide_banner',
+            '-y',  # Sobrescribir archivo existente
+            '-f', 'rawvideo',
+            '-pix_fmt', self.pixel_format,
+            '-s', f'{width}x{height}',
+            '-framerate', str(self.fps),
+            '-i', '-',
+        ] + progress_arguments() + self.output_args + [self.output_path]
+
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, pipesize=_pipe_size())
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._progress_thread = threading.Thread(target=read_progress,
+                                                 args=(self.process.stdout, self._handle_progress), daemon=True)
+        self._progress_thread.start()
+
+    def _handle_progress(self, encoder_stats):
+        if self.progress_handler is not None:
+            self.progress_handler(encoder_stats)
+
+    def _read_stderr(self):
+        for line in iter(self.process.stderr.readline, b''):
+            self._stderr.append(line.decode(errors='replace').rstrip())
+
+    def _prepare(self, frame):
+        if len(frame.shape) == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+        if raw_pixel_format(frame) != self.pixel_format:
+            frame = (frame.astype(np.uint16) * 257 if self.pixel_format == 'bgr48le'
+                     else (frame >> 8).astype(np.uint8))
+        return np.ascontiguousarray(frame)
+
+    def write(self, frame):
+        if self.process is None:
+            if len(frame.shape) == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            self._start(frame)
+        self.process.stdin.write(memoryview(self._prepare(frame)).cast('B'))
+        self.frames_written += 1
+
+    def close(self):
+        """Cierra la entrada y espera a FFmpeg; devuelve True si terminó bien"""
+        if self.process is None:
+            return False
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        self._stderr_thread.join(timeout=5)
+        self._progress_thread.join(timeout=5)
+        return returncode == 0
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def error_output(self):
+        return "\n".join(self._stderr)
+
+
+_END_OF_FRAMES = object()
+
+
+class OutputEncoder:
+    """Una de las salidas de `VideoExporter.export_outputs`.
+
+    Recibe los fotogramas ya preparados por una cola acotada y, en su propio hilo, los
+    redimensiona a su resolución y los escribe en su FFmpegWriter. Si el codificador falla
+    la salida se marca como fallida pero sigue vaciando la cola, para no bloquear al resto.
+    """
+
+    def __init__(self, spec, progress_handler=None, max_queue=4):
+        self.output_path = spec['path']
+        self.codec = spec.get('codec', 'libx264')
+        self.resolution = spec.get('resolution', '1920x1080')
+        self.width, self.height = map(int, self.resolution.split('x'))
+        self.writer = FFmpegWriter(self.output_path, spec.get('fps', 30), codec_arguments(self.codec),
+                                   progress_handler=progress_handler)
+        self.failed = False
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._thread = threading.Thread(target=self._run, name="output-encoder", daemon=True)
+        self._thread.start()
+
+    def put(self, frame):
+        self._queue.put(frame)
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is _END_OF_FRAMES:
+                return
+            if self.failed:
+                continue
+            try:
+                self.writer.write(resize_frame(frame, self.width, self.height))
+            except Exception:
+                self.failed = True
+                self.writer.kill()
+
+    def finish(self):
+        """Espera a que se escriban los fotogramas pendientes y cierra FFmpeg; True si terminó bien"""
+        self._queue.put(_END_OF_FRAMES)
+        self._thread.join()
+        if self.writer.close() and not self.failed and self.writer.frames_written > 0:
+            return True
+        print(f"Error en FFmpeg ({self.output_path}): {self.writer.error_output()}")
+        return False
+
 
 class VideoExporter:
-    def __init__(self):
-        pass
+    def __init__(self, max_queue=4):
+        # Fotogramas listos que pueden esperar al codificador (limita la memoria)
+        self.max_queue = max_queue
+        self._cancel_event = threading.Event()
+        self._killers = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Cancela la exportación en curso, incluidos todos los segmentos"""
+        self._cancel_event.set()
+        with self._lock:
+            killers = list(self._killers)
+        for kill in killers:
+            kill()
+
+    def _register(self, kill):
+        with self._lock:
+            self._killers.append(kill)
+
+    def _unregister(self, kill):
+        with self._lock:
+            if kill in self._killers:
+                self._killers.remove(kill)
+
+    def export_video(self, image_sequence, output_path, fps=30, resolution="1920x1080", codec='libx264',
+                     progress_callback=None, segments=1, checkpoint=False,
+                     checkpoint_frames=config.EXPORT_CHECKPOINT_FRAMES):
+        """Exporta una secuencia de imágenes (arrays numpy o FrameSource) a video usando FFmpeg.
+
+        Los fotogramas se preparan (decodificación, ajustes y redimensionado) en paralelo y
+        en orden, se producen en un hilo de fondo (BackgroundIterator) y se envían sin
+        comprimir (rawvideo) a un proceso FFmpeg persistente por stdin: no hay archivos
+        temporales ni recompresión intermedia, y en memoria solo hay unos pocos a la vez.
+        `progress_callback(stats)` recibe periódicamente el progreso del codificador y de
+        la cola de fotogramas (ver ExportProgress). Con `segments` > 1 se codifican varios
+        tramos a la vez y con `checkpoint` la exportación se puede reanudar si se
+        interrumpe, guardando tramos de `checkpoint_frames` (ver `export_segmented`).
+        """
+        self._cancel_event.clear()
+        if not image_sequence:
+            print("Secuencia de imágenes vacía")
+            return False
+
+        if segments > 1 or checkpoint:
+            return self.export_segmented(image_sequence, output_path, fps, resolution, codec, segments,
+                                         progress_callback, checkpoint=checkpoint,
+                                         checkpoint_frames=checkpoint_frames)
+        return self._encode(image_sequence, output_path, fps, resolution, codec, progress_callback)
+
+    def export_outputs(self, image_sequence, outputs, progress_callback=None):
+        """Exporta varias versiones (p. ej. máster ProRes 4K, web 1080p y previo 720p) con una
+        sola pasada de decodificación, corrección y ajustes.
+
+        `outputs` es una lista de dicts con `path` y, opcionalmente, `codec`, `resolution` y
+        `fps`. Cada fotograma preparado se reparte a un OutputEncoder por salida, que lo
+        redimensiona y lo codifica en su propio proceso FFmpeg; la salida más lenta marca el
+        ritmo. Si una salida falla las demás continúan. `progress_callback` recibe el progreso
+        agregado (SegmentedProgress, con una entrada de `segments` por salida). Devuelve True
+        si todas las salidas se han exportado.
+        """
+        self._cancel_event.clear()
+        if not image_sequence or not outputs:
+            print("Secuencia de imágenes o lista de salidas vacía")
+            return False
+        if len(outputs) == 1:
+            spec = outputs[0]
+            return self.export_video(image_sequence, spec['path'], spec.get('fps', 30),
+                                     spec.get('resolution', '1920x1080'), spec.get('codec', 'libx264'),
+                                     progress_callback)
+
+        if not isinstance(image_sequence, FrameSource):
+            image_sequence = ArrayFrameSource(image_sequence)
+        total = len(image_sequence)
+        frames = BackgroundIterator(image_sequence, self.max_queue)
+        progress = SegmentedProgress(progress_callback, [total] * len(outputs))
+
+        encoders = []
+        for index, spec in enumerate(outputs):
+            # La cola de fotogramas preparados es común: sus estadísticas se cuentan una sola vez
+            output_progress = ExportProgress(lambda stats, index=index: progress.update(index, stats), total,
+                                             frames if index == 0 else None, self.max_queue if index == 0 else None)
+            encoders.append(OutputEncoder(spec, output_progress.update, self.max_queue))
+        for encoder in encoders:
+            self._register(encoder.writer.kill)
+
+        try:
+            try:
+                for i, img in enumerate(frames):
+                    if self._cancel_event.is_set():
+                        print("Exportación cancelada")
+                        break
+                    if img is None:
+                        print(f"Frame {i} vacío, se omite")
+                        continue
+                    for encoder in encoders:
+                        encoder.put(img)
+            except Exception as e:
+                print(f"Error al preparar los fotogramas: {e}")
+                self.cancel()
+            finally:
+                frames.close()
 
-    def export_video(self, image_sequence, output_path, fps=30, resolution="1920x1080", codec='libx264'):
-        """Exporta una secuencia de imágenes (arrays numpy) a video usando FFmpeg"""
+            results = [encoder.finish() for encoder in encoders]
+            if self._cancel_event.is_set():
+                return False
+            for encoder, result in zip(encoders, results):
+                if not result:
+                    print(f"No se pudo exportar {encoder.output_path}")
+            return all(results)
+        finally:
+            for encoder in encoders:
+                self._unregister(encoder.writer.kill)
+
+    def export_draft(self, image_sequence, output_path, fps=30, resolution=config.DRAFT_RESOLUTION,
+                     progress_callback=None):
+        """Exportación rápida de revisión.
+
+        Los RAW no se revelan: se usa su miniatura JPEG incrustada, y los JPEG se decodifican
+        directamente a escala reducida (la mayor que no quede por debajo de `resolution`).
+        Los ajustes y la corrección de deflicker de la fuente se mantienen, y el vídeo se
+        codifica con H.264 en preset ultrafast.
+        """
+        self._cancel_event.clear()
         if not image_sequence:
             print("Secuencia de imágenes vacía")
             return False
 
-        # Parsear resolución
+        if isinstance(image_sequence, PathFrameSource):
+            width, height = map(int, resolution.split('x'))
+            reduction = draft_reduction(image_sequence.paths()[0], width, height)
+            image_sequence = image_sequence.with_decode_mode("analysis", reduction)
+        return self._encode(image_sequence, output_path, fps, resolution, 'draft', progress_callback)
+
+    def _encode(self, image_sequence, output_path, fps, resolution, codec, progress_callback=None,
+                codec_args=None):
+        """Codifica una secuencia en un único proceso FFmpeg"""
+        codec_args = codec_args or codec_arguments(codec)
+
+        paths = passthrough_paths(image_sequence)
+        if paths is not None:
+            return self.export_passthrough(paths, output_path, fps, resolution, codec, progress_callback,
+                                           codec_args)
+
+        # El redimensionado a la resolución de salida (INTER_AREA) se hace en los
+        # trabajadores que preparan cada fotograma, no en el filtro de FFmpeg
         width, height = map(int, resolution.split('x'))
+        if not isinstance(image_sequence, FrameSource):
+            image_sequence = ArrayFrameSource(image_sequence)
+        image_sequence = image_sequence.resize(width, height)
 
-        # Determinar codec y opciones basado en la elección
-        codec_options = {
-            'libx264': {
-                'codec': 'libx264',
-                'pix_fmt': 'yuv420p',
-                'crf': '23'
-            },
-            'libx265': {
-                'codec': 'libx265',
-                'pix_fmt': 'yuv420p',
-                'crf': '28'
-            },
-            'mpeg4': {
-                'codec': 'mpeg4',
-                'pix_fmt': 'yuv420p',
-                'qscale': '5'
-            },
-            'prores': {
-                'codec': 'prores_ks',
-                'pix_fmt': 'yuv422p10le',
-                'profile': '3'
-            }
-        }
+        total = len(image_sequence)
+        frames = BackgroundIterator(image_sequence, self.max_queue)
+        progress = ExportProgress(progress_callback, total, frames, self.max_queue)
+        writer = FFmpegWriter(output_path, fps, codec_args, progress_handler=progress.update)
+        self._register(writer.kill)
+        try:
+            try:
+                for i, img in enumerate(frames):
+                    if self._cancel_event.is_set():
+                        print("Exportación cancelada")
+                        writer.kill()
+                        return False
+                    if img is None:
+                        print(f"Frame {i} vacío, se omite")
+                    else:
+                        writer.write(img)
+            except BrokenPipeError:
+                print("FFmpeg cerró la entrada antes de tiempo")
+            finally:
+                frames.close()
 
-        if codec not in codec_options:
-            codec = 'libx264'
+            if writer.close() and writer.frames_written > 0:
+                return True
 
-        options = codec_options[codec]
+            if not self._cancel_event.is_set():
+                print(f"Error en FFmpeg: {writer.error_output()}")
+            return False
 
-        temp_dir = None
+        except Exception as e:
+            print(f"Error al exportar video: {e}")
+            frames.close()
+            writer.kill()
+            return False
+        finally:
+            self._unregister(writer.kill)
+
+    def export_passthrough(self, image_paths, output_path, fps=30, resolution="1920x1080", codec='libx264',
+                           progress_callback=None, codec_args=None):
+        """Exporta archivos JPEG sin procesar leyéndolos directamente con FFmpeg.
+
+        Python no decodifica ningún fotograma: el demuxer concat lee los archivos y el
+        escalado y la conversión de formato de píxel se hacen dentro de FFmpeg.
+        """
+        width, height = map(int, resolution.split('x'))
+        options = CODEC_OPTIONS.get(codec, CODEC_OPTIONS['libx264'])
+        codec_args = codec_args or codec_arguments(codec)
+        list_path = None
+        progress = ExportProgress(progress_callback, len(image_paths))
         try:
-            # Guardar imágenes en archivos temporales (FFmpeg necesita archivos)
-            temp_dir = tempfile.mkdtemp()
-            file_list = []
-
-            for i, img in enumerate(image_sequence):
-                filename = os.path.join(temp_dir, f"frame_{i:06d}.jpg")
-                success = cv2.imwrite(filename, img)
-                if success:
-                    file_list.append(filename)
-                else:
-                    print(f"Error al guardar frame {i}")
-
-            # Crear archivo temporal con lista de imágenes
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-                for image_path in file_list:
-                    f.write(f"file '{os.path.abspath(image_path)}'\n")
-                list_file = f.name
-
-            # Construir comando FFmpeg
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+                write_concat_list(image_paths, f)
+                list_path = f.name
+
             cmd = [
                 'ffmpeg',
+                '-hide_banner',
                 '-y',  # Sobrescribir archivo existente
+                # Un fotograma por archivo a `fps`, ignorando las marcas de tiempo del demuxer
+                '-r', str(fps),
                 '-f', 'concat',
                 '-safe', '0',
-                '-i', list_file,
-                '-r', str(fps),
-                '-s', resolution,
-                '-c:v', options['codec'],
-                '-pix_fmt', options['pix_fmt'],
-            ]
-
-            # Añadir opciones de calidad según el codec
-            if options.get('crf'):
-                cmd.extend(['-crf', options['crf']])
-            elif options.get('qscale'):
-                cmd.extend(['-qscale:v', options['qscale']])
-            elif options.get('profile'):
-                cmd.extend(['-profile:v', options['profile']])
-
-            cmd.append(output_path)
-
-            # Ejecutar FFmpeg
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            # Limpiar archivos temporales
-            os.unlink(list_file)
-            if temp_dir:
-                shutil.rmtree(temp_dir)
-
-            if result.returncode == 0:
-                return True
-            else:
-                print(f"Error en FFmpeg: {result.stderr}")
-                return False
+                '-i', list_path,
+                '-vf', f"scale={width}:{height}:flags=area,format={options['pix_fmt']}",
+            ] + progress_arguments() + codec_args + [output_path]
 
+            with tempfile.TemporaryFile() as stderr_file:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+                kill = process.kill
+                self._register(kill)
+                try:
+                    read_progress(process.stdout, progress.update)
+                    returncode = process.wait()
+                finally:
+                    self._unregister(kill)
+                if returncode != 0:
+                    if not self._cancel_event.is_set():
+                        stderr_file.seek(0)
+                        print(f"Error en FFmpeg: {stderr_file.read().decode(errors='replace')[-4000:]}")
+                    return False
+            return True
         except Exception as e:
             print(f"Error al exportar video: {e}")
-            if temp_dir:
-                shutil.rmtree(temp_dir)
-            return False
\ No newline at end of file
+            return False
+        finally:
+            if list_path is not None:
+                os.unlink(list_path)
+
+    def export_segmented(self, image_sequence, output_path, fps=30, resolution="1920x1080", codec='libx264',
+                         segments=4, progress_callback=None, gop_size=None, checkpoint=False,
+                         checkpoint_frames=config.EXPORT_CHECKPOINT_FRAMES):
+        """Codifica la secuencia por tramos, `segments` a la vez, y los une sin recodificar.
+
+        Cada tramo empieza en un múltiplo del GOP (por defecto 2 segundos) y se codifica con
+        ese mismo `-g` en su propio proceso FFmpeg, con su parte de los trabajadores de
+        decodificación. Al terminar todos, el demuxer concat los une con copia de flujo.
+        Si un tramo falla se cancelan los demás.
+
+        Con `checkpoint` la secuencia se divide además en tramos de como mucho
+        `checkpoint_frames` fotogramas que se guardan en `<salida>.lapsefy-segments/` junto a
+        un manifiesto (SegmentCheckpoint). Si la exportación falla el directorio se conserva y
+        al relanzarla con los mismos ajustes solo se codifican los tramos que faltan. Sin
+        `checkpoint` (o si la fuente no permite comprobar que es la misma) los tramos van a
+        un directorio temporal que se borra siempre.
+        """
+        self._cancel_event.clear()
+        if not isinstance(image_sequence, FrameSource):
+            image_sequence = ArrayFrameSource(image_sequence)
+
+        total = len(image_sequence)
+        segments = max(1, segments)
+        gop_size = gop_size or max(1, int(round(fps))) * 2
+        fingerprint = source_fingerprint(image_sequence) if checkpoint else None
+        if checkpoint and fingerprint is None:
+            print("La secuencia no admite puntos de control (fotogramas en memoria); se exporta sin ellos")
+        chunks = segments
+        if fingerprint is not None:
+            # Los tramos guardados dependen solo del tamaño de punto de control, no de cuántos
+            # se codifican a la vez: así se puede reanudar con otro número de `segments`
+            chunks = max(1, -(-total // max(gop_size, checkpoint_frames)))
+            if chunks < segments:
+                print(f"Con puntos de control de {checkpoint_frames} fotogramas solo hay {chunks} tramos; "
+                      f"se codifican {chunks} a la vez en lugar de {segments}")
+        ranges = segment_ranges(total, chunks, gop_size)
+        if len(ranges) <= 1 and fingerprint is None:
+            return self._encode(image_sequence, output_path, fps, resolution, codec, progress_callback)
+
+        codec_args = codec_arguments(codec) + ['-g', str(gop_size)]
+        extension = os.path.splitext(output_path)[1] or '.mp4'
+        if fingerprint is not None:
+            store = SegmentCheckpoint(output_path, settings_hash(
+                fingerprint, fps=fps, resolution=resolution, codec=codec, codec_args=codec_args,
+                extension=extension, ranges=ranges))
+            done = store.open()
+            if done:
+                print(f"Reanudando exportación: {len(done)} de {len(ranges)} tramos ya terminados")
+            segment_paths = [store.segment_path(i, extension) for i in range(len(ranges))]
+            encode_paths = [store.partial_path(i, extension) for i in range(len(ranges))]
+        else:
+            store = None
+            done = set()
+            segment_dir = tempfile.mkdtemp(prefix='.lapsefy-segments-',
+                                           dir=os.path.dirname(os.path.abspath(output_path)))
+            segment_paths = [os.path.join(segment_dir, f"segment_{i:04d}{extension}") for i in range(len(ranges))]
+            encode_paths = segment_paths
+
+        progress = SegmentedProgress(progress_callback, [end - start for start, end in ranges])
+        for index in done:
+            start, end = ranges[index]
+            progress.update(index, {"frame": end - start, "progress": 100, "fps": None})
+        pending = [i for i in range(len(ranges)) if i not in done]
+
+        # Repartir los trabajadores de decodificación entre los tramos simultáneos
+        concurrent = max(1, min(segments, len(pending)))
+        max_workers = getattr(image_sequence, 'max_workers', None) or os.cpu_count() or 1
+        workers_per_segment = max(1, max_workers // concurrent)
+        results = {i: True for i in done}
+        next_pending = iter(pending)
+        lock = threading.Lock()
+
+        def encode_segment(index):
+            start, end = ranges[index]
+            segment = image_sequence[start:end]
+            if hasattr(segment, 'max_workers'):
+                segment.max_workers = workers_per_segment
+            results[index] = self._encode(segment, encode_paths[index], fps, resolution, codec,
+                                          lambda stats: progress.update(index, stats), codec_args)
+            if results[index] and store is not None:
+                store.commit(index, start, end, extension)
+            if not results[index] and not self._cancel_event.is_set():
+                print(f"Error en el segmento {index}; se cancelan los demás")
+                self.cancel()
+
+        def encode_pending():
+            while not self._cancel_event.is_set():
+                with lock:
+                    index = next(next_pending, None)
+                if index is None:
+                    return
+                encode_segment(index)
+
+        success = False
+        try:
+            threads = [threading.Thread(target=encode_pending, daemon=True) for _ in range(concurrent)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            if len(results) < len(ranges) or not all(results.values()) or self._cancel_event.is_set():
+                if store is not None:
+                    print(f"Exportación incompleta: los tramos terminados quedan en {store.directory}")
+                return False
+            success = self.concat_segments(segment_paths, output_path)
+            return success
+        finally:
+            if store is None:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+            elif success:
+                store.remove()
+
+    def concat_segments(self, segment_paths, output_path):
+        """Une segmentos de vídeo con los mismos parámetros sin recodificar (copia de flujo)"""
+        list_path = None
+        try:
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+                write_concat_list(segment_paths, f)
+                list_path = f.name
+
+            cmd = ['ffmpeg', '-hide_banner', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+                   '-c', 'copy', output_path]
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                print(f"Error al unir los segmentos: {result.stderr.decode(errors='replace')[-4000:]}")
+                return False
+            return True
+        except Exception as e:
+            print(f"Error al unir los segmentos: {e}")
+            return False
+        finally:
+            if list_path is not None:
+                os.unlink(list_path)
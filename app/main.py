@@ -1,9 +1,12 @@
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from app.ui.main_window import MainWindow
 
 def main():
+    # Necesario para los procesos de decodificación en ejecutables congelados (PyInstaller)
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
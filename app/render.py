@@ -0,0 +1,298 @@
+# app/render.py
+"""Renderizado de timelapses sin interfaz gráfica.
+
+Ejemplo:
+    python -m app.render /ruta/a/fotos -o timelapse.mp4 --fps 30 --workers 16
+    python -m app.render /ruta/a/fotos -o /ruta/a/salida --sequence-format tiff --bit-depth 16
+
+El progreso se escribe en stdout como líneas JSON; los mensajes para personas van a stderr.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from app.utils import config
+from app.utils.file_utils import IMAGE_EXTENSIONS, natural_sort_key
+
+# Los módulos de app.core se importan en main(), después de redirigir stdout: al importarse
+# (pyexiv2, pywt) y en los procesos de decodificación pueden escribir mensajes con print()
+
+SMOOTHING_METHODS = ["moving_average", "gaussian", "savitzky_golay", "wavelet", "loess"]
+CODECS = ["libx264", "libx265", "mpeg4", "prores"]
+
+# stdout original, reservado para las líneas JSON de progreso (ver redirect_stdout)
+_progress_stream = None
+
+
+def redirect_stdout():
+    """Reserva el stdout original para el progreso y envía todo lo demás a stderr.
+
+    Se duplica el descriptor 1 y después se apunta a stderr, tanto en sys.stdout como a nivel
+    de descriptor, para que los print() de las bibliotecas, FFmpeg y los procesos hijos (que
+    heredan los descriptores) no se mezclen con el JSON.
+    """
+    global _progress_stream
+    if _progress_stream is not None:
+        return
+    sys.stdout.flush()
+    _progress_stream = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+
+def emit_progress(stage, **fields):
+    """Escribe una línea JSON de progreso en stdout"""
+    record = {"stage": stage, "time": round(time.time(), 3)}
+    record.update(fields)
+    print(json.dumps(record), file=_progress_stream or sys.stdout, flush=True)
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def collect_images(inputs, recursive=False):
+    """Reúne las imágenes de los archivos y carpetas indicados, en orden natural"""
+    from app.core.image_loader import ImageLoader
+
+    image_paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            loader = ImageLoader()
+            found = []
+            loader.finished.connect(found.extend)
+            loader.load_images(path, recursive=recursive)
+            image_paths.extend(found)
+        elif path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path):
+            image_paths.append(path)
+        else:
+            log(f"Se ignora {path}: no es una imagen soportada ni una carpeta")
+    return sorted(image_paths, key=natural_sort_key)
+
+
+def resolution_spec(value):
+    """Resolución en formato ANCHOxALTO"""
+    width, separator, height = value.lower().partition("x")
+    if not separator or not width.isdigit() or not height.isdigit() or int(width) <= 0 or int(height) <= 0:
+        raise argparse.ArgumentTypeError(f"Resolución no válida: {value!r} (ANCHOxALTO, p. ej. 1920x1080)")
+    return f"{int(width)}x{int(height)}"
+
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"Debe ser un entero positivo: {value!r}")
+    return number
+
+
+def output_spec(value):
+    """Salida adicional en formato RUTA[,CODEC[,ANCHOxALTO]]"""
+    parts = [part.strip() for part in value.split(",")]
+    if not parts[0] or len(parts) > 3:
+        raise argparse.ArgumentTypeError(f"Salida no válida: {value!r} (RUTA[,CODEC[,ANCHOxALTO]])")
+    spec = {"path": parts[0]}
+    if len(parts) > 1 and parts[1]:
+        if parts[1] not in CODECS:
+            raise argparse.ArgumentTypeError(f"Codec no válido: {parts[1]!r} (opciones: {', '.join(CODECS)})")
+        spec["codec"] = parts[1]
+    if len(parts) > 2 and parts[2]:
+        spec["resolution"] = resolution_spec(parts[2])
+    return spec
+
+
+def build_parser():
+    from app.core.image_sequence_exporter import DEFAULT_NAME_PATTERN, SEQUENCE_FORMATS
+
+    parser = argparse.ArgumentParser(prog="python -m app.render",
+                                     description="Renderiza un timelapse sin interfaz gráfica.")
+    parser.add_argument("inputs", nargs="+", help="Imágenes o carpetas de entrada")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Archivo de vídeo de salida (o carpeta con --sequence-format)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Explorar subcarpetas")
+
+    output = parser.add_argument_group("salida")
+    output.add_argument("--fps", type=positive_int, default=30)
+    output.add_argument("--resolution", type=resolution_spec, help="Resolución ANCHOxALTO (por defecto 1920x1080; "
+                                             f"{config.DRAFT_RESOLUTION} con --draft)")
+    output.add_argument("--codec", choices=CODECS, default="libx264")
+    output.add_argument("--exposure", type=float, default=0.0, help="Ajuste de exposición en EV (-1 a 1)")
+    output.add_argument("--segments", type=positive_int, default=1,
+                        help="Codificar N tramos en paralelo y unirlos sin recodificar (H.265, ProRes)")
+    output.add_argument("--extra-output", type=output_spec, action="append", default=[],
+                        metavar="RUTA[,CODEC[,ANCHOxALTO]]",
+                        help="Otra versión del vídeo generada en la misma pasada (se puede repetir); "
+                             "por defecto con el codec y la resolución de la salida principal")
+    output.add_argument("--draft", action="store_true",
+                        help="Borrador de revisión rápido: miniaturas RAW o JPEG reducido, "
+                             "resolución pequeña y H.264 ultrafast (ignora --codec)")
+    output.add_argument("--resume", action="store_true",
+                        help="Guardar los tramos terminados junto a la salida y, si se relanza con los "
+                             "mismos ajustes, codificar solo los que falten")
+    output.add_argument("--checkpoint-frames", type=positive_int,
+                        help="Fotogramas por tramo guardado con --resume: lo que se vuelve a codificar tras "
+                             "un fallo y, como mucho, total/N tramos en paralelo "
+                             f"(por defecto {config.EXPORT_CHECKPOINT_FRAMES})")
+    output.add_argument("--contrast", type=float, default=0.0, help="Ajuste de contraste (-1 a 1)")
+
+    sequence = parser.add_argument_group("secuencia de imágenes")
+    sequence.add_argument("--sequence-format", choices=list(SEQUENCE_FORMATS),
+                          help="Exportar imágenes numeradas en la carpeta de salida en lugar de un vídeo")
+    sequence.add_argument("--bit-depth", type=int, choices=[8, 16],
+                          help="Bits por canal (por defecto 8; con 16 los RAW se revelan a 16 bits; "
+                               "JPEG siempre 8)")
+    sequence.add_argument("--compression",
+                          help="Compresión TIFF (none, lzw, deflate) o nivel PNG (0-9)")
+    sequence.add_argument("--quality", type=int, default=95, help="Calidad JPEG (1-100)")
+    sequence.add_argument("--name-pattern", default=DEFAULT_NAME_PATTERN,
+                          help="Nombre de archivo sin extensión; admite {index} y {name} (nombre de origen)")
+    sequence.add_argument("--start-number", type=int, default=1, help="Primer valor de {index}")
+
+    deflicker = parser.add_argument_group("deflicker")
+    deflicker.add_argument("--no-deflicker", action="store_true", help="Exportar sin corrección de brillo")
+    deflicker.add_argument("--smoothing-method", choices=SMOOTHING_METHODS, default="moving_average")
+    deflicker.add_argument("--smoothing-level", type=int, default=10, help="Fuerza de suavizado (1-100)")
+    deflicker.add_argument("--window-size", type=int, help="Tamaño de ventana del suavizado")
+    deflicker.add_argument("--sigma", type=float, help="Sigma (gaussiano / wavelet)")
+    deflicker.add_argument("--order", type=int, help="Orden del polinomio (Savitzky-Golay)")
+    deflicker.add_argument("--analysis-mode", choices=["reduced", "full", "bayer"], default="reduced",
+                           help="Cómo medir el brillo (bayer: datos del sensor RAW sin revelar)")
+    deflicker.add_argument("--exposure-mode", choices=["off", "normalize", "replace"], default="off",
+                           help="Usar la exposición EXIF: normalize suaviza descontando los saltos de EV; "
+                                "replace predice la curva solo con el EXIF, sin decodificar")
+
+    performance = parser.add_argument_group("rendimiento")
+    performance.add_argument("--workers", type=positive_int, default=None,
+                             help="Procesos de decodificación (por defecto, todos los núcleos)")
+    performance.add_argument("--cache-dir", default=config.CACHE_DIR,
+                             help="Directorio de la caché de fotogramas RAW revelados")
+    performance.add_argument("--no-cache", action="store_true", help="No usar la caché en disco")
+    return parser
+
+
+def check_arguments(parser, args):
+    """Rechaza las combinaciones de opciones que una de ellas haría ignorar"""
+    if args.sequence_format:
+        exclusive = [("--draft", args.draft), ("--extra-output", args.extra_output)]
+        exporter = "--sequence-format"
+    elif args.draft:
+        exclusive = [("--extra-output", args.extra_output)]
+        exporter = "--draft"
+    elif args.extra_output:
+        exclusive = []
+        exporter = "--extra-output"
+    else:
+        exclusive = []
+        exporter = None
+    if exporter is not None:
+        exclusive += [("--segments", args.segments > 1), ("--resume", args.resume)]
+    for option, used in exclusive:
+        if used:
+            parser.error(f"{option} no se puede combinar con {exporter}")
+    if args.checkpoint_frames is not None and not args.resume:
+        parser.error("--checkpoint-frames solo tiene efecto con --resume")
+    if args.checkpoint_frames is None:
+        args.checkpoint_frames = config.EXPORT_CHECKPOINT_FRAMES
+
+
+def render(args):
+    from app.core.deflicker import Deflickerer
+    from app.core.frame_source import PathFrameSource
+    from app.core.image_sequence_exporter import ImageSequenceExporter
+    from app.core.video_exporter import VideoExporter
+
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    image_paths = collect_images(args.inputs, args.recursive)
+    emit_progress("import", frames=len(image_paths))
+    if not image_paths:
+        log("No se encontraron imágenes")
+        return 1
+
+    source = PathFrameSource(image_paths, max_workers=args.workers, cache_dir=cache_dir)
+
+    if not args.no_deflicker:
+        deflickerer = Deflickerer(max_workers=args.workers, cache_dir=cache_dir)
+        deflickerer.analysis_mode = args.analysis_mode
+        deflickerer.progress_updated.connect(lambda value: emit_progress("analysis", progress=value))
+
+        deflickerer.exposure_mode = args.exposure_mode
+        curve = []
+        if args.exposure_mode != "off":
+            log(f"Leyendo la exposición EXIF de {len(image_paths)} imágenes...")
+            if args.exposure_mode == "replace":
+                curve = deflickerer.predict_brightness_curve(image_paths)
+            else:
+                deflickerer.get_exposure_curve(image_paths)
+            if deflickerer.exposure_curve is None:
+                log("No hay datos de exposición EXIF; se usa solo el brillo medido")
+            else:
+                emit_progress("exposure", min_ev=float(min(deflickerer.exposure_curve)),
+                              max_ev=float(max(deflickerer.exposure_curve)))
+
+        if not curve:
+            log(f"Analizando brillo de {len(image_paths)} imágenes...")
+            curve = deflickerer.get_brightness_curve(image_paths)
+        if len(curve) != len(image_paths):
+            log("El análisis de brillo no se completó")
+            return 1
+        if deflickerer.analysis_error:
+            emit_progress("analysis_error", **deflickerer.analysis_error)
+
+        params = {key: value for key, value in (("window_size", args.window_size), ("sigma", args.sigma),
+                                                  ("order", args.order)) if value is not None}
+        smoothed_curve = deflickerer.get_smoothed_curve(args.smoothing_level, args.smoothing_method, params)
+        emit_progress("smoothing", method=args.smoothing_method, level=args.smoothing_level)
+
+        source = deflickerer.correct_source(source, smoothed_curve)
+
+    source = source.adjust(args.exposure, args.contrast)
+
+    total = len(source)
+
+    def on_export_progress(stats):
+        emit_progress("export", **stats)
+
+    exporter = VideoExporter()
+    if args.sequence_format:
+        log(f"Exportando {total} imágenes {args.sequence_format.upper()} a {args.output}...")
+        success = ImageSequenceExporter(max_workers=args.workers).export_sequence(
+            source, args.output, args.sequence_format, args.bit_depth, args.compression, args.quality,
+            args.resolution, args.name_pattern, args.start_number, progress_callback=on_export_progress)
+    elif args.draft:
+        log(f"Exportando borrador de {total} fotogramas a {args.output}...")
+        success = exporter.export_draft(source, args.output, args.fps, args.resolution or config.DRAFT_RESOLUTION,
+                                        progress_callback=on_export_progress)
+    elif args.extra_output:
+        main_output = {"path": args.output, "codec": args.codec, "resolution": args.resolution or "1920x1080",
+                       "fps": args.fps}
+        outputs = [main_output] + [{**main_output, **spec} for spec in args.extra_output]
+        log(f"Exportando {total} fotogramas a {len(outputs)} salidas: "
+            + ", ".join(spec["path"] for spec in outputs))
+        success = exporter.export_outputs(source, outputs, progress_callback=on_export_progress)
+    else:
+        log(f"Exportando {total} fotogramas a {args.output}...")
+        success = exporter.export_video(source, args.output, args.fps, args.resolution or "1920x1080",
+                                        args.codec, progress_callback=on_export_progress,
+                                        segments=args.segments, checkpoint=args.resume,
+                                        checkpoint_frames=args.checkpoint_frames)
+    emit_progress("done", success=success, output=os.path.abspath(args.output))
+    return 0 if success else 1
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    redirect_stdout()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_arguments(parser, args)
+    return render(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
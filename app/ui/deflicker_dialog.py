@@ -7,7 +7,6 @@ from PySide6.QtCore import Qt, QPoint, Signal, QObject
 from PySide6.QtGui import QImage, QPixmap, QCursor
 import pyqtgraph as pg
 import numpy as np
-from scipy import signal
 import json
 import os
 import threading
@@ -15,6 +14,8 @@ import rawpy
 import cv2
 import time
 
+from app.core import exposure, smoothing
+
 
 class ReadOnlyPlotWidget(pg.PlotWidget):
     """PlotWidget personalizado de solo lectura para evitar interacciones no deseadas"""
@@ -44,13 +45,15 @@ class DeflickerDialog(QDialog):
     # Señal para actualizar la previsualización desde el hilo
     preview_ready = Signal(int, QPixmap)
 
-    def __init__(self, brightness_curve, image_sequence, parent=None):
+    def __init__(self, brightness_curve, image_sequence, parent=None, exposure_curve=None):
         super().__init__(parent)
         self.setWindowTitle("Ajuste de Deflicker Avanzado")
         self.setMinimumSize(1400, 900)
 
         self.original_curve = brightness_curve
         self.image_sequence = image_sequence
+        # Exposición EXIF (en pasos) de cada fotograma, si se conoce
+        self.exposure_curve = exposure_curve
         self.smoothed_curve = None
         self.smoothing_level = 10
         self.smoothing_method = "moving_average"
@@ -201,6 +204,14 @@ class DeflickerDialog(QDialog):
         self.param_layout.addWidget(self.order_spin)
         controls_layout.addWidget(self.param_widget)
 
+        # Compensación de los saltos de exposición (ISO, obturador, diafragma) según el EXIF
+        self.exposure_check = QCheckBox("Compensar saltos de exposición (EXIF)")
+        self.exposure_check.setEnabled(self.exposure_curve is not None)
+        if self.exposure_curve is None:
+            self.exposure_check.setToolTip("Las imágenes no tienen datos de exposición EXIF")
+        self.exposure_check.toggled.connect(self.on_params_changed)
+        controls_layout.addWidget(self.exposure_check)
+
         # Checkbox para ajuste manual
         self.manual_check = QCheckBox("Ajuste manual")
         self.manual_check.toggled.connect(self.on_manual_toggled)
@@ -656,18 +667,11 @@ class DeflickerDialog(QDialog):
         order = self.order_spin.value()
 
         # Suavizar datos según el método seleccionado
-        if self.smoothing_method == "moving_average":
-            smoothed = self.moving_average_smooth(self.original_curve, window_size)
-        elif self.smoothing_method == "gaussian":
-            smoothed = self.gaussian_smooth(self.original_curve, window_size, sigma)
-        elif self.smoothing_method == "savitzky_golay":
-            smoothed = self.savitzky_golay_smooth(self.original_curve, window_size, order)
-        elif self.smoothing_method == "wavelet":
-            smoothed = self.wavelet_smooth(self.original_curve, sigma)
-        elif self.smoothing_method == "loess":
-            smoothed = self.loess_smooth(self.original_curve, window_size)
+        if self.exposure_check.isChecked() and self.exposure_curve is not None:
+            smoothed = exposure.smooth_with_exposure(self.original_curve, self.exposure_curve,
+                                                     self.smoothing_method, window_size, sigma, order)
         else:
-            smoothed = self.original_curve
+            smoothed = smoothing.smooth(self.original_curve, self.smoothing_method, window_size, sigma, order)
 
         self.smoothed_curve = smoothed
 
@@ -733,72 +737,6 @@ class DeflickerDialog(QDialog):
 
         self.stats_label.setText(stats_text)
 
-    def moving_average_smooth(self, data, window_size):
-        """Suavizado por media móvil con manejo de bordes"""
-        if window_size % 2 == 0:
-            window_size += 1
-
-        half_window = window_size // 2
-        smoothed = np.zeros_like(data, dtype=np.float64)
-
-        for i in range(len(data)):
-            start = max(0, i - half_window)
-            end = min(len(data), i + half_window + 1)
-            smoothed[i] = np.mean(data[start:end])
-
-        return smoothed
-
-    def gaussian_smooth(self, data, window_size, sigma):
-        """Suavizado con filtro gaussiano"""
-        # Crear kernel gaussiano
-        x = np.arange(-window_size // 2, window_size // 2 + 1)
-        kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
-        kernel /= np.sum(kernel)
-
-        # Aplicar convolución
-        smoothed = np.convolve(data, kernel, mode='same')
-        return smoothed
-
-    def savitzky_golay_smooth(self, data, window_size, order):
-        """Suavizado con filtro Savitzky-Golay (preserva mejor los picos)"""
-        if len(data) < window_size:
-            return data
-
-        return signal.savgol_filter(data, window_size, order)
-
-    def wavelet_smooth(self, data, sigma):
-        """Suavizado usando transformada wavelet"""
-        try:
-            import pywt
-            # Descomposición wavelet
-            coeffs = pywt.wavedec(data, 'db4', level=4)
-            # Umbralizado de coeficientes
-            coeffs[1:] = [pywt.threshold(c, sigma * np.std(c), 'soft') for c in coeffs[1:]]
-            # Reconstrucción
-            smoothed = pywt.waverec(coeffs, 'db4')
-            # Ajustar longitud si es necesario
-            if len(smoothed) > len(data):
-                smoothed = smoothed[:len(data)]
-            elif len(smoothed) < len(data):
-                smoothed = np.pad(smoothed, (0, len(data) - len(smoothed)), 'edge')
-
-            return smoothed
-        except ImportError:
-            print("Advertencia: pywt no instalado. Usando media móvil.")
-            return self.moving_average_smooth(data, 21)
-
-    def loess_smooth(self, data, window_size):
-        """Suavizado LOESS (regresión local)"""
-        try:
-            from statsmodels.nonparametric.smoothers_lowess import lowess
-            x = np.arange(len(data))
-            frac = window_size / len(data)
-            smoothed = lowess(data, x, frac=frac, it=0, return_sorted=False)
-            return smoothed
-        except ImportError:
-            print("Advertencia: statsmodels no instalado. Usando media móvil.")
-            return self.moving_average_smooth(data, window_size)
-
     def show_advanced_stats(self):
         """Mostrar diálogo con estadísticas avanzadas"""
         from PySide6.QtWidgets import QMessageBox
@@ -879,6 +817,7 @@ class DeflickerDialog(QDialog):
             "window_size": self.window_spin.value(),
             "sigma": self.sigma_spin.value(),
             "order": self.order_spin.value(),
+            "exposure_compensation": self.exposure_check.isChecked(),
             "manual_adjustment": self.manual_adjustment,
             "control_points": self.control_points
         }
@@ -915,6 +854,8 @@ class DeflickerDialog(QDialog):
             self.window_spin.setValue(settings.get("window_size", 21))
             self.sigma_spin.setValue(settings.get("sigma", 2.0))
             self.order_spin.setValue(settings.get("order", 3))
+            self.exposure_check.setChecked(settings.get("exposure_compensation", False)
+                                           and self.exposure_curve is not None)
             self.manual_check.setChecked(settings.get("manual_adjustment", False))
             self.control_points = settings.get("control_points", [])
 
@@ -2,36 +2,48 @@ import cv2
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QLabel, QSlider, QSpinBox,
                                QFileDialog, QComboBox, QGroupBox, QStatusBar, QMessageBox,
-                               QSplitter, QProgressBar, QApplication)
+                               QSplitter, QProgressBar, QApplication, QCheckBox)
 from PySide6.QtCore import Qt, QSize, QEvent, QTimer, Signal
 from PySide6.QtGui import QIcon, QAction, QImage, QPixmap
 from .preview_widget import PreviewWidget
 from .thumbnail_view import ThumbnailView
 from .deflicker_dialog import DeflickerDialog
 from app.core.image_processor import ImageProcessor
+from app.core.frame_source import ArrayFrameSource, PathFrameSource
 from app.core.video_exporter import VideoExporter
-from app.core.deflicker import Deflickerer
+from app.core.image_sequence_exporter import ImageSequenceExporter
+from app.core.deflicker import Deflickerer, correct_brightness
+from app.core.frame_store import FrameStore
+from app.core.image_loader import ImageLoader
+from app.core.prefetcher import FramePrefetcher
+from app.core.sequence_manifest import SequenceManifest
+from app.utils import config
+from app.utils.file_utils import natural_sort_key
 import os
 import threading
 
 # Añadir al inicio del archivo
 import json
-from scipy import signal
-try:
-    import pywt
-    HAS_PYWT = True
-except ImportError:
-    HAS_PYWT = False
-    print("Advertencia: PyWavelets no está instalado. El suavizado wavelet no estará disponible.")
-
-try:
-    from statsmodels.nonparametric.smoothers_lowess import lowess
-    HAS_STATSMODELS = True
-except ImportError:
-    HAS_STATSMODELS = False
-    print("Advertencia: statsmodels no está instalado. El suavizado LOESS no estará disponible.")
 import numpy as np
 
+def format_export_stats(stats):
+    """Texto de la barra de estado con el progreso de la exportación"""
+    parts = [f"Exportando {stats['frame']}/{stats['total']}"]
+    if stats.get("fps"):
+        parts.append(f"{stats['fps']:.1f} fps")
+    if stats.get("speed"):
+        parts.append(f"{stats['speed']:.2f}x")
+    if stats.get("bitrate"):
+        parts.append(f"{stats['bitrate'] / 1000:.1f} Mbit/s")
+    if stats.get("eta") is not None:
+        minutes, seconds = divmod(int(stats["eta"]), 60)
+        parts.append(f"quedan {minutes}:{seconds:02d}")
+    if stats.get("queue_depth") is not None:
+        parts.append(f"cola {stats['queue_depth']}/{stats['queue_size']} "
+                     f"(preparación {stats['producer_fps']:.1f} fps)")
+    return " · ".join(parts)
+
+
 # --- Eventos Personalizados ---
 DeflickerCurveReadyEventType = QEvent.registerEventType()
 DeflickerFinishedEventType = QEvent.registerEventType()
@@ -93,7 +105,11 @@ class MainWindow(QMainWindow):
         self.image_sequence = []
         self.current_frame_index = 0
         self.processed_sequence = []
+        # Curva suavizada pendiente de aplicar al exportar (modo de corrección en streaming)
+        self.deflicker_curve = None
         self.deflickerer = Deflickerer()
+        self.manifest = None
+        self.scan_file_stats = None
 
         # Ajustes actuales
         self.current_exposure = 0.0
@@ -110,6 +126,7 @@ class MainWindow(QMainWindow):
 
         # Inicializar procesador
         self.processor = ImageProcessor()
+        self.prefetcher = FramePrefetcher(self.processor)
         self.deflicker_dialog = None
         self.deflicker_preview_ready.connect(self.on_deflicker_preview_ready)
 
@@ -142,6 +159,14 @@ class MainWindow(QMainWindow):
         self.btn_import = QPushButton("Seleccionar Imágenes")
         self.btn_import.clicked.connect(self.import_images)
         import_layout.addWidget(self.btn_import)
+        self.btn_import_folder = QPushButton("Seleccionar Carpeta")
+        self.btn_import_folder.clicked.connect(self.import_folder)
+        import_layout.addWidget(self.btn_import_folder)
+        self.recursive_check = QCheckBox("Incluir subcarpetas")
+        self.recursive_check.setToolTip(
+            "Importar también las imágenes de las subcarpetas (descartes, horquillados, "
+            "exportaciones anteriores...)")
+        import_layout.addWidget(self.recursive_check)
         controls_layout.addWidget(import_group)
 
         info_group = QGroupBox("Información")
@@ -177,6 +202,12 @@ class MainWindow(QMainWindow):
         self.btn_deflicker = QPushButton("Aplicar Deflicker")
         self.btn_deflicker.clicked.connect(self.apply_deflicker)
         deflicker_layout.addWidget(self.btn_deflicker)
+        self.deflicker_streaming_check = QCheckBox("Corregir al exportar (sin guardar fotogramas)")
+        self.deflicker_streaming_check.setChecked(True)
+        self.deflicker_streaming_check.setToolTip(
+            "La corrección se aplica fotograma a fotograma durante la exportación, "
+            "sin generar antes la secuencia corregida completa")
+        deflicker_layout.addWidget(self.deflicker_streaming_check)
         controls_layout.addWidget(deflicker_group)
 
         export_group = QGroupBox("Exportar")
@@ -217,9 +248,15 @@ class MainWindow(QMainWindow):
         format_layout = QHBoxLayout()
         format_layout.addWidget(QLabel("Formato:"))
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["MP4", "MOV", "AVI"])
+        self.format_combo.addItems(["MP4", "MOV", "AVI", "TIFF (secuencia)", "PNG (secuencia)", "JPEG (secuencia)"])
+        self.format_combo.setToolTip("Las secuencias de imágenes se exportan a una carpeta, a resolución original")
         format_layout.addWidget(self.format_combo)
         export_layout.addLayout(format_layout)
+        self.draft_check = QCheckBox(f"Borrador rápido ({config.DRAFT_RESOLUTION})")
+        self.draft_check.setToolTip(
+            "Vídeo de revisión: usa las miniaturas de los RAW o el JPEG reducido, sin revelar, "
+            "y codifica en H.264 ultrafast. Ignora la resolución y el codec elegidos")
+        export_layout.addWidget(self.draft_check)
         self.btn_export = QPushButton("Exportar Timelapse")
         self.btn_export.clicked.connect(self.export_timelapse)
         export_layout.addWidget(self.btn_export)
@@ -265,11 +302,14 @@ class MainWindow(QMainWindow):
         file_menu = menubar.addMenu("Archivo")
         import_action = QAction("Importar Imágenes...", self);
         import_action.triggered.connect(self.import_images)
+        import_folder_action = QAction("Importar Carpeta...", self)
+        import_folder_action.triggered.connect(self.import_folder)
         export_action = QAction("Exportar Timelapse...", self);
         export_action.triggered.connect(self.export_timelapse)
         exit_action = QAction("Salir", self);
         exit_action.triggered.connect(self.close)
         file_menu.addAction(import_action);
+        file_menu.addAction(import_folder_action)
         file_menu.addAction(export_action);
         file_menu.addSeparator();
         file_menu.addAction(exit_action)
@@ -285,9 +325,55 @@ class MainWindow(QMainWindow):
         filters = f"{all_supported_filter};;RAW Files ({raw_formats});;JPEG Files ({jpeg_formats});;All Files (*)"
         image_paths, _ = QFileDialog.getOpenFileNames(self, "Seleccionar Imágenes", "", filters)
         if image_paths:
-            image_paths.sort()
+            image_paths.sort(key=natural_sort_key)
             self.on_images_loaded(image_paths)
 
+    def import_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta de Imágenes")
+        if not folder:
+            return
+
+        self.btn_import.setEnabled(False)
+        self.btn_import_folder.setEnabled(False)
+        self.recursive_check.setEnabled(False)
+        self.status_bar.showMessage("Explorando carpeta...")
+        self.scan_found = 0
+        self.scan_first_image = None
+        self.thumbnail_view.begin_streaming()
+
+        self.image_loader = ImageLoader()
+        self.image_loader.progress_updated.connect(self.on_scan_progress)
+        self.image_loader.batch_found.connect(self.on_scan_batch)
+        self.image_loader.finished.connect(self.on_folder_scanned)
+        threading.Thread(target=self.image_loader.load_images,
+                         args=(folder, self.recursive_check.isChecked()), daemon=True).start()
+
+    def on_scan_progress(self, progress, message):
+        self.status_bar.showMessage(message)
+
+    def on_scan_batch(self, batch):
+        """Muestra cada lote en cuanto se encuentra, sin esperar al final de la exploración"""
+        self.scan_found += len(batch)
+        self.image_count_label.setText(f"Imágenes: {self.scan_found}")
+        self.thumbnail_view.append_thumbnails(batch)
+
+        # Previsualizar el primer fotograma (en orden natural) de los encontrados hasta ahora
+        first_image = min(batch, key=natural_sort_key)
+        if self.scan_first_image is None or natural_sort_key(first_image) < natural_sort_key(self.scan_first_image):
+            self.scan_first_image = first_image
+            self.preview_widget.show_loading()
+            threading.Thread(target=self.load_and_display_image, args=(first_image, False), daemon=True).start()
+
+    def on_folder_scanned(self, image_paths):
+        self.btn_import.setEnabled(True)
+        self.btn_import_folder.setEnabled(True)
+        self.recursive_check.setEnabled(True)
+        self.scan_file_stats = self.image_loader.file_stats
+        if not image_paths:
+            self.thumbnail_view.cancel_loading()
+        self.on_images_loaded(image_paths)
+        self.scan_file_stats = None
+
     def on_deflicker_preview_ready(self, frame_idx, qt_image):
         """Manejar la previsualización lista para el diálogo de deflicker"""
         # Esta función debería comunicarse con el diálogo abierto
@@ -298,13 +384,21 @@ class MainWindow(QMainWindow):
     def on_images_loaded(self, image_sequence):
         if image_sequence:
             self.image_sequence = image_sequence
-            self.processed_sequence = []
+            self.set_processed_sequence([])
+            self.deflicker_curve = None
             self.current_frame_index = 0
+            self.prefetcher.reset()
             self.processor.clear_cache()
 
             self.status_bar.showMessage("Cargando miniaturas...")
             self.set_ui_enabled(False)
 
+            self.manifest = None
+            self.deflickerer.manifest = None
+            self.deflickerer.reset_exposure_curve()
+            threading.Thread(target=self.load_manifest, args=(self.image_sequence, self.scan_file_stats),
+                             daemon=True).start()
+
             self.thumbnail_view.load_thumbnails(self.image_sequence)
             self.thumbnail_view.loading_finished.connect(self.on_thumbnails_ready)
 
@@ -314,6 +408,31 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "Sin Imágenes", "No se seleccionaron imágenes válidas.")
 
+    def set_processed_sequence(self, processed_sequence):
+        """Sustituye la secuencia procesada liberando el almacén en disco anterior"""
+        previous = self.processed_sequence
+        self.processed_sequence = processed_sequence
+        if isinstance(previous, FrameStore) and previous is not processed_sequence:
+            previous.close()
+
+    def load_manifest(self, image_sequence, file_stats=None):
+        """Carga y valida el índice de la secuencia, releyendo solo los archivos modificados"""
+        try:
+            manifest = SequenceManifest.for_sequence(image_sequence)
+            manifest.load()
+            changed = manifest.refresh(image_sequence, file_stats)
+            if manifest.dirty:
+                manifest.save()
+        except Exception as e:
+            print(f"Error al cargar el índice de la secuencia: {e}")
+            return
+
+        # Ignorar el resultado si mientras tanto se ha importado otra secuencia
+        if image_sequence is self.image_sequence:
+            self.manifest = manifest
+            self.deflickerer.manifest = manifest
+            print(f"Índice de secuencia listo: {len(changed)} de {len(image_sequence)} archivos actualizados")
+
     def on_thumbnails_ready(self):
         self.status_bar.showMessage(f"Cargadas {len(self.image_sequence)} imágenes.", 5000)
         self.set_ui_enabled(True)
@@ -339,7 +458,11 @@ class MainWindow(QMainWindow):
         if self.processed_sequence and self.current_frame_index < len(self.processed_sequence):
             base_image = self.processed_sequence[self.current_frame_index]
         else:
-            base_image = self.processor.load_image(image_path, use_cache=True)
+            base_image = self.processor.load_image(image_path, use_cache=True, readonly=True)
+            if base_image is not None and self.has_deflicker_curve():
+                # Modo streaming: corregir solo el fotograma que se muestra
+                factor = self.deflickerer.get_correction_factor(self.current_frame_index, self.deflicker_curve)
+                base_image = correct_brightness(base_image, factor, self.deflickerer.correction_mode)
 
         if base_image is not None:
             threading.Thread(target=self.process_preview_image,
@@ -368,7 +491,7 @@ class MainWindow(QMainWindow):
         except ValueError:
             pass
 
-    def show_current_frame(self):
+    def show_current_frame(self, jump=True):
         if not self.image_sequence: return
 
         for slider in [self.exposure_slider, self.contrast_slider]:
@@ -384,12 +507,17 @@ class MainWindow(QMainWindow):
             self.preview_widget.show_loading()
 
         threading.Thread(target=self.load_and_display_image, args=(image_path,), daemon=True).start()
+        # Precargar los vecinos según la dirección y velocidad de navegación
+        self.prefetcher.navigate(self.image_sequence, self.current_frame_index, jump=jump)
 
         self.highlight_current_thumbnail()
         self.update_navigation_buttons()
 
-    def load_and_display_image(self, image_path):
-        base_image = self.processor.load_image(image_path, use_cache=True)
+    def load_and_display_image(self, image_path, only_if_current=True):
+        base_image = self.prefetcher.load(image_path)
+        if only_if_current and not self.is_current_image(image_path):
+            # El usuario ya ha navegado a otro fotograma
+            return
         if base_image is not None:
             filename = os.path.basename(image_path)
             QApplication.instance().postEvent(
@@ -397,6 +525,10 @@ class MainWindow(QMainWindow):
                 PreviewUpdateEvent(base_image, filename, base_image.shape[1], base_image.shape[0])
             )
 
+    def is_current_image(self, image_path):
+        return (0 <= self.current_frame_index < len(self.image_sequence) and
+                self.image_sequence[self.current_frame_index] == image_path)
+
     def highlight_current_thumbnail(self):
         if self.image_sequence:
             self.thumbnail_view.highlight_thumbnail(self.current_frame_index)
@@ -404,12 +536,12 @@ class MainWindow(QMainWindow):
     def next_image(self):
         if self.current_frame_index < len(self.image_sequence) - 1:
             self.current_frame_index += 1
-            self.show_current_frame()
+            self.show_current_frame(jump=False)
 
     def previous_image(self):
         if self.current_frame_index > 0:
             self.current_frame_index -= 1
-            self.show_current_frame()
+            self.show_current_frame(jump=False)
 
     def update_estimated_duration(self):
         if self.image_sequence:
@@ -428,6 +560,10 @@ class MainWindow(QMainWindow):
         QMessageBox.about(self, "Acerca de Lapsefy",
                           "Lapsefy v1.1\n\nUna aplicación para crear timelapses a partir de secuencias de imágenes.")
 
+    def closeEvent(self, event):
+        self.prefetcher.shutdown()
+        super().closeEvent(event)
+
     def customEvent(self, event):
         event_type = event.type()
         if event_type == PreviewUpdateEventType:
@@ -460,6 +596,7 @@ class MainWindow(QMainWindow):
         def calculate_curve_thread():
             try:
                 curve = self.deflickerer.get_brightness_curve(self.image_sequence)
+                self.deflickerer.get_exposure_curve(self.image_sequence)
                 QApplication.instance().postEvent(self, DeflickerCurveReadyEvent(curve))
             except Exception as e:
                 error_message = f"Error al calcular la curva de brillo: {e}"
@@ -473,31 +610,53 @@ class MainWindow(QMainWindow):
 
     def handle_curve_ready(self, curve):
         self.progress_bar.setVisible(False)
-        self.status_bar.showMessage("Análisis de brillo completado.")
+        analysis_error = self.deflickerer.analysis_error
+        if analysis_error:
+            self.status_bar.showMessage(
+                f"Análisis de brillo completado (error estimado ≤ {analysis_error['max_abs_error']:.2f} "
+                f"en {analysis_error['samples']} fotogramas de control)."
+            )
+        else:
+            self.status_bar.showMessage("Análisis de brillo completado.")
         self.set_ui_enabled(True)
 
         if not curve:
             QMessageBox.critical(self, "Error", "No se pudo generar la curva de brillo.")
             return
 
-        dialog = DeflickerDialog(curve, self.image_sequence, self)
+        dialog = DeflickerDialog(curve, self.image_sequence, self, self.deflickerer.exposure_curve)
         if dialog.exec():
-            smoothing_level = dialog.get_smoothing_level()
-            self.status_bar.showMessage("Aplicando corrección de deflicker...")
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            self.set_ui_enabled(False)
+            self.start_deflicker_correction(dialog.get_smoothed_curve())
+
+    def start_deflicker_correction(self, smoothed_curve):
+        """Aplica la curva suavizada: en streaming se guarda para la exportación; si no, se
+        genera la secuencia corregida completa en un hilo"""
+        if self.deflicker_streaming_check.isChecked():
+            self.set_processed_sequence([])
+            self.deflicker_curve = list(smoothed_curve)
+            self.handle_deflicker_finished()
+            return
 
-            def apply_correction_thread():
-                try:
-                    smoothed_curve = self.deflickerer.get_smoothed_curve(smoothing_level)
-                    self.processed_sequence = self.deflickerer.apply_correction(self.image_sequence, smoothed_curve)
-                    QApplication.instance().postEvent(self, DeflickerFinishedEvent())
-                except Exception as e:
-                    error_message = f"Error al aplicar la corrección: {e}"
-                    QApplication.instance().postEvent(self, DeflickerErrorEvent(error_message))
+        self.deflicker_curve = None
+        self.status_bar.showMessage("Aplicando corrección de deflicker...")
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.set_ui_enabled(False)
 
-            threading.Thread(target=apply_correction_thread, daemon=True).start()
+        def apply_correction_thread():
+            try:
+                self.set_processed_sequence(self.deflickerer.apply_correction(self.image_sequence, smoothed_curve))
+                QApplication.instance().postEvent(self, DeflickerFinishedEvent())
+            except Exception as e:
+                error_message = f"Error al aplicar la corrección: {e}"
+                QApplication.instance().postEvent(self, DeflickerErrorEvent(error_message))
+
+        threading.Thread(target=apply_correction_thread, daemon=True).start()
+
+    def has_deflicker_curve(self):
+        """Indica si hay una corrección en streaming válida para la secuencia actual"""
+        return (self.deflicker_curve is not None and len(self.deflicker_curve) == len(self.image_sequence)
+                and len(self.deflickerer.brightness_curve) == len(self.image_sequence))
 
     def handle_deflicker_finished(self):
         self.progress_bar.setVisible(False)
@@ -518,7 +677,11 @@ class MainWindow(QMainWindow):
             return
 
         format_ext = {"MP4": "mp4", "MOV": "mov", "AVI": "avi"}
+        sequence_formats = {"TIFF (secuencia)": "tiff", "PNG (secuencia)": "png", "JPEG (secuencia)": "jpeg"}
         selected_format = self.format_combo.currentText()
+        if selected_format in sequence_formats:
+            self.export_image_sequence(sequence_formats[selected_format])
+            return
         file_extension = format_ext.get(selected_format, "mp4")
 
         output_path, _ = QFileDialog.getSaveFileName(self, "Guardar timelapse", f"timelapse.{file_extension}",
@@ -539,31 +702,61 @@ class MainWindow(QMainWindow):
             codec_map = {"H.264 (libx264)": "libx264", "H.265 (libx265)": "libx265", "MPEG-4": "mpeg4",
                          "ProRes": "prores"}
             codec = codec_map.get(self.codec_combo.currentText(), "libx264")
-
-            sequence_to_export = self.processed_sequence if self.processed_sequence else self.image_sequence
-            is_path_sequence = not bool(self.processed_sequence)
+            draft = self.draft_check.isChecked()
+            if draft:
+                resolution = config.DRAFT_RESOLUTION
 
             threading.Thread(target=self.process_and_export,
-                             args=(output_path, fps, resolution, codec, sequence_to_export, is_path_sequence),
+                             args=(output_path, fps, resolution, codec, self.build_export_source(), draft),
                              daemon=True).start()
 
-    def process_and_export(self, output_path, fps, resolution, codec, image_sequence, is_path_sequence):
+    def export_image_sequence(self, image_format):
+        output_dir = QFileDialog.getExistingDirectory(self, "Carpeta para la secuencia de imágenes")
+        if not output_dir:
+            return
+
+        self.progress_bar.setVisible(True)
+        self.set_ui_enabled(False)
+        self.status_bar.showMessage("Exportando secuencia de imágenes...")
+        threading.Thread(target=self.process_and_export_sequence,
+                         args=(output_dir, image_format, self.build_export_source()), daemon=True).start()
+
+    def process_and_export_sequence(self, output_dir, image_format, source):
         try:
-            final_sequence = []
-            if is_path_sequence:
-                total = len(image_sequence)
-                for i, path in enumerate(image_sequence):
-                    QApplication.instance().postEvent(self, StatusUpdateEvent(f"Procesando {i + 1}/{total}",
-                                                                              int(((i + 1) / total) * 50)))
-                    img = self.processor.adjust_image(path, self.current_exposure, self.current_contrast)
-                    if img is not None:
-                        final_sequence.append(img)
-            else:
-                final_sequence = image_sequence
-                QApplication.instance().postEvent(self, StatusUpdateEvent("Preparando para exportar...", 50))
+            def on_progress(stats):
+                QApplication.instance().postEvent(self, StatusUpdateEvent(format_export_stats(stats),
+                                                                          stats["progress"]))
+
+            success = ImageSequenceExporter().export_sequence(source, output_dir, image_format,
+                                                              progress_callback=on_progress)
+            message = "Secuencia exportada correctamente" if success else "Error al exportar la secuencia"
+            QApplication.instance().postEvent(self, ExportFinishedEvent(success, message))
+        except Exception as e:
+            QApplication.instance().postEvent(self, ExportFinishedEvent(False, f"Error durante exportación: {str(e)}"))
+
+    def build_export_source(self):
+        """Fuente perezosa de fotogramas a exportar: secuencia procesada o rutas originales, con ajustes"""
+        if self.processed_sequence:
+            source = ArrayFrameSource(self.processed_sequence)
+        else:
+            source = PathFrameSource(self.image_sequence)
+            if self.has_deflicker_curve():
+                # La corrección se aplica en los procesos trabajadores mientras se codifica
+                source = self.deflickerer.correct_source(source, self.deflicker_curve)
+        return source.adjust(self.current_exposure, self.current_contrast)
+
+    def process_and_export(self, output_path, fps, resolution, codec, source, draft=False):
+        try:
+            def on_progress(stats):
+                QApplication.instance().postEvent(self, StatusUpdateEvent(format_export_stats(stats),
+                                                                          stats["progress"]))
 
             exporter = VideoExporter()
-            success = exporter.export_video(final_sequence, output_path, fps, resolution, codec)
+            if draft:
+                success = exporter.export_draft(source, output_path, fps, resolution, progress_callback=on_progress)
+            else:
+                success = exporter.export_video(source, output_path, fps, resolution, codec,
+                                                progress_callback=on_progress)
             message = "Timelapse exportado correctamente" if success else "Error al exportar"
             QApplication.instance().postEvent(self, ExportFinishedEvent(success, message))
         except Exception as e:
@@ -584,8 +777,10 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Advertencia", "Primero debe importar una secuencia de imágenes.")
             return
 
-        # Verificar si ya tenemos la curva de brillo calculada
-        if not self.deflickerer.brightness_curve:
+        # Solo se analizan los fotogramas cuyo brillo no está ya en la caché de resultados; el
+        # EXIF se lee una vez por secuencia y siempre fuera del hilo de la interfaz (sin el
+        # índice de la secuencia supone abrir cada archivo)
+        if self.deflickerer.missing_brightness(self.image_sequence) or not self.deflickerer.exposure_read:
             self.status_bar.showMessage("Analizando brillo de la secuencia...")
             self.progress_bar.setVisible(True)
             self.progress_bar.setValue(0)
@@ -594,6 +789,8 @@ class MainWindow(QMainWindow):
             def calculate_curve_thread():
                 try:
                     curve = self.deflickerer.get_brightness_curve(self.image_sequence)
+                    if not self.deflickerer.exposure_read:
+                        self.deflickerer.get_exposure_curve(self.image_sequence)
                     QApplication.instance().postEvent(self, DeflickerCurveReadyEvent(curve))
                 except Exception as e:
                     error_message = f"Error al calcular la curva de brillo: {e}"
@@ -601,7 +798,8 @@ class MainWindow(QMainWindow):
 
             threading.Thread(target=calculate_curve_thread, daemon=True).start()
         else:
-            # Si ya tenemos la curva, mostrar el diálogo directamente
+            # Si ya tenemos todos los valores, mostrar el diálogo directamente
+            self.deflickerer.get_brightness_curve(self.image_sequence)
             self._show_deflicker_dialog()
 
     def _show_deflicker_dialog(self):
@@ -609,33 +807,15 @@ class MainWindow(QMainWindow):
         self.deflicker_dialog = DeflickerDialog(
             self.deflickerer.brightness_curve,
             self.image_sequence,
-            self
+            self,
+            self.deflickerer.exposure_curve
         )
         # Conectar las señales del diálogo
         # self.deflicker_dialog.preview_updated.connect(self.on_deflicker_preview_requested)
         # print("Señal preview_updated conectada correctamente")
 
         if self.deflicker_dialog.exec():
-            smoothing_level = self.deflicker_dialog.get_smoothing_level()
-            smoothed_curve = self.deflicker_dialog.get_smoothed_curve()
-
-            self.status_bar.showMessage("Aplicando corrección de deflicker...")
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            self.set_ui_enabled(False)
-
-            def apply_correction_thread():
-                try:
-                    self.processed_sequence = self.deflickerer.apply_correction(
-                        self.image_sequence,
-                        smoothed_curve
-                    )
-                    QApplication.instance().postEvent(self, DeflickerFinishedEvent())
-                except Exception as e:
-                    error_message = f"Error al aplicar la corrección: {e}"
-                    QApplication.instance().postEvent(self, DeflickerErrorEvent(error_message))
-
-            threading.Thread(target=apply_correction_thread, daemon=True).start()
+            self.start_deflicker_correction(self.deflicker_dialog.get_smoothed_curve())
 
         # Limpiar referencia al diálogo
         self.deflicker_dialog = None
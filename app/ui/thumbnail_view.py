@@ -5,28 +5,43 @@ from PySide6.QtCore import Qt, QSize, Signal, QObject
 from PySide6.QtGui import QPixmap, QImage, QIcon
 import cv2
 import numpy as np
+import queue
 import threading
 import rawpy
 
 
 class ThumbnailLoader(QObject):
-    progress = Signal(int, QPixmap, str)
+    progress = Signal(QPixmap, str)
     finished = Signal()
 
-    def __init__(self, image_paths, thumbnail_size=100):
+    def __init__(self, image_paths=(), thumbnail_size=100):
         super().__init__()
-        self.image_paths = image_paths
         self.thumbnail_size = thumbnail_size
         self._is_cancelled = False
+        # Rutas pendientes; se pueden añadir más mientras se cargan (importación por lotes)
+        self._queue = queue.Queue()
+        if image_paths:
+            self.add_paths(image_paths)
+            self.close()
+
+    def add_paths(self, image_paths):
+        for image_path in image_paths:
+            self._queue.put(image_path)
+
+    def close(self):
+        """No se añadirán más rutas: el hilo termina al vaciar la cola"""
+        self._queue.put(None)
 
     def cancel(self):
         self._is_cancelled = True
+        self._queue.put(None)
 
     def run(self):
         """Carga miniaturas en un hilo separado, con soporte para RAW."""
         raw_extensions = ['.raw', '.cr2', '.nef', '.arw', '.raf']
-        for i, image_path in enumerate(self.image_paths):
-            if self._is_cancelled:
+        while not self._is_cancelled:
+            image_path = self._queue.get()
+            if image_path is None or self._is_cancelled:
                 break
             try:
                 image = None
@@ -47,7 +62,7 @@ class ThumbnailLoader(QObject):
 
                 if image is not None:
                     thumbnail = self.create_thumbnail(image)
-                    self.progress.emit(i, thumbnail, image_path)
+                    self.progress.emit(thumbnail, image_path)
             except Exception as e:
                 print(f"Error al cargar miniatura para {image_path}: {e}")
 
@@ -82,9 +97,13 @@ class ThumbnailView(QWidget):
     def __init__(self):
         super().__init__()
         self.init_ui()
-        self.thumbnails = []
+        # Botón de cada miniatura cargada y posición de cada ruta en la rejilla
+        self.thumbnails = {}
+        self.image_paths = []
+        self.positions = {}
         self.thumbnail_loader_thread = None
         self.thumbnail_loader = None
+        self.streaming = False
         self.selected_thumbnail = None
         self.default_stylesheet = """
             QPushButton { border: 1px solid #cccccc; border-radius: 4px; padding: 2px; background-color: #f0f0f0; }
@@ -104,18 +123,59 @@ class ThumbnailView(QWidget):
         layout.addWidget(self.scroll_area)
 
     def load_thumbnails(self, image_paths, fps=30):
+        if self.streaming:
+            # Las miniaturas ya se han ido cargando por lotes: solo falta ordenarlas
+            self.streaming = False
+            self.set_image_paths(image_paths)
+            self.thumbnail_loader.close()
+            return
+
+        self._start_loader()
+        self.set_image_paths(image_paths)
+        self.thumbnail_loader.add_paths(image_paths)
+        self.thumbnail_loader.close()
+
+    def begin_streaming(self):
+        """Prepara la vista para recibir rutas por lotes con append_thumbnails()"""
+        self._start_loader()
+        self.streaming = True
+
+    def append_thumbnails(self, image_paths):
+        """Añade al final de la rejilla las miniaturas de un lote encontrado al explorar"""
+        for image_path in image_paths:
+            self.positions[image_path] = len(self.image_paths)
+            self.image_paths.append(image_path)
+        self.thumbnail_loader.add_paths(image_paths)
+
+    def set_image_paths(self, image_paths):
+        """Fija el orden definitivo de las miniaturas, recolocando las ya cargadas"""
+        self.image_paths = list(image_paths)
+        self.positions = {image_path: index for index, image_path in enumerate(self.image_paths)}
+        for image_path, thumbnail_button in self.thumbnails.items():
+            self.grid_layout.removeWidget(thumbnail_button)
+            self._place(image_path, thumbnail_button)
+
+    def _start_loader(self):
         if self.thumbnail_loader:
             self.thumbnail_loader.cancel()
+        self.streaming = False
         self.clear_thumbnails()
 
-        self.thumbnail_loader = ThumbnailLoader(image_paths)
+        self.thumbnail_loader = ThumbnailLoader()
         self.thumbnail_loader.progress.connect(self.add_thumbnail)
         self.thumbnail_loader.finished.connect(self.loading_finished)
 
         self.thumbnail_loader_thread = threading.Thread(target=self.thumbnail_loader.run)
         self.thumbnail_loader_thread.start()
 
-    def add_thumbnail(self, index, thumbnail, image_path):
+    def _place(self, image_path, thumbnail_button):
+        row, col = divmod(self.positions[image_path], 8)  # Aumentado a 8 columnas para aprovechar mejor el espacio
+        self.grid_layout.addWidget(thumbnail_button, row, col)
+
+    def add_thumbnail(self, thumbnail, image_path):
+        if image_path not in self.positions or image_path in self.thumbnails:
+            # Miniatura de una carga anterior ya cancelada
+            return
         thumbnail_button = QPushButton()
         thumbnail_button.setStyleSheet(self.default_stylesheet)
         thumbnail_button.setIcon(QIcon(thumbnail))
@@ -124,32 +184,36 @@ class ThumbnailView(QWidget):
         thumbnail_button.setToolTip(image_path)
         thumbnail_button.clicked.connect(lambda: self.on_thumbnail_clicked(image_path))
 
-        row, col = divmod(index, 8)  # Aumentado a 8 columnas para aprovechar mejor el espacio
-        self.grid_layout.addWidget(thumbnail_button, row, col)
-        self.thumbnails.append(thumbnail_button)
+        self._place(image_path, thumbnail_button)
+        self.thumbnails[image_path] = thumbnail_button
 
     def on_thumbnail_clicked(self, image_path):
         self.thumbnail_clicked.emit(image_path)
 
     def highlight_thumbnail(self, index):
-        if not (0 <= index < len(self.thumbnails)):
+        if not (0 <= index < len(self.image_paths)):
+            return
+        thumbnail_button = self.thumbnails.get(self.image_paths[index])
+        if thumbnail_button is None:
             return
 
         if self.selected_thumbnail:
             self.selected_thumbnail.setStyleSheet(self.default_stylesheet)
 
-        thumbnail_button = self.thumbnails[index]
         thumbnail_button.setStyleSheet(self.highlight_stylesheet)
         self.selected_thumbnail = thumbnail_button
         self.scroll_area.ensureWidgetVisible(thumbnail_button)
 
     def cancel_loading(self):
+        self.streaming = False
         if self.thumbnail_loader:
             self.thumbnail_loader.cancel()
 
     def clear_thumbnails(self):
-        for thumbnail in self.thumbnails:
+        for thumbnail in self.thumbnails.values():
             self.grid_layout.removeWidget(thumbnail)
             thumbnail.deleteLater()
         self.thumbnails.clear()
+        self.image_paths = []
+        self.positions = {}
         self.selected_thumbnail = None
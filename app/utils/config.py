@@ -0,0 +1,35 @@
+# app/utils/config.py
+import os
+import tempfile
+
+# Caché en disco de fotogramas RAW revelados (se puede cambiar con variables de entorno).
+# Cada fotograma ocupa ancho x alto x 3 bytes sin comprimir (unos 70 MB a 24 MP). Para que
+# una secuencia completa se reutilice entre pasadas el límite debe cubrirla entera: 3000
+# RAW de 24 MP necesitan unos 210 GB. Con menos, solo se conservan los primeros fotogramas
+# y el resto se vuelve a revelar (sin escribir en disco) en cada pasada.
+CACHE_DIR = os.environ.get(
+    "LAPSEFY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "lapsefy", "frames")
+)
+DISK_CACHE_MAX_BYTES = int(os.environ.get("LAPSEFY_DISK_CACHE_MB", 20 * 1024)) * 1024 * 1024
+
+# Presupuesto de memoria para la caché de previsualización (fotogramas decodificados)
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("LAPSEFY_PREVIEW_CACHE_MB", 1024)) * 1024 * 1024
+
+# Factor de reducción (2, 4 u 8) de la decodificación usada para medir el brillo
+ANALYSIS_REDUCTION = 8
+# Paso (en celdas 2x2 del patrón Bayer) del submuestreo usado para medir el brillo de RAW sin revelar
+BAYER_ANALYSIS_STEP = 4
+# Fotogramas que se miden también a resolución completa para estimar el error del análisis reducido
+ANALYSIS_VERIFY_SAMPLES = 5
+
+# Directorio de los archivos mapeados en memoria con las secuencias procesadas
+FRAME_STORE_DIR = os.environ.get("LAPSEFY_FRAME_STORE_DIR", tempfile.gettempdir())
+
+# Resolución por defecto de la exportación en borrador (revisión rápida)
+DRAFT_RESOLUTION = "960x540"
+
+# Fotogramas por tramo guardado al exportar con puntos de control (exportación reanudable).
+# Es lo máximo que se vuelve a codificar tras un fallo y también limita cuántos tramos se
+# pueden codificar a la vez (un render de 3000 fotogramas da 10 tramos)
+EXPORT_CHECKPOINT_FRAMES = 300
@@ -0,0 +1,24 @@
+# app/utils/file_utils.py
+import os
+import re
+
+RAW_EXTENSIONS = ('.raw', '.cr2', '.nef', '.arw', '.raf')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff') + RAW_EXTENSIONS
+
+_DIGITS_RE = re.compile(r'(\d+)')
+
+
+def is_raw_file(path):
+    """Indica si la ruta corresponde a un archivo RAW soportado"""
+    return path.lower().endswith(RAW_EXTENSIONS)
+
+
+def file_identity(path):
+    """Identidad de un archivo en disco: ruta absoluta, tamaño y fecha de modificación"""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def natural_sort_key(path):
+    """Clave de ordenación natural: IMG_9999 va antes que IMG_10000"""
+    return [int(part) if part.isdigit() else part.lower() for part in _DIGITS_RE.split(path)]